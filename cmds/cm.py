@@ -36,6 +36,9 @@ def file_finder(filename, default_path_list=['.', op.join(op.expanduser('~'), '.
 
 default_config_file = file_finder('db_config.json')
 
+# DB objects (and so engines/connection pools) already made, keyed on (mode, url).
+_db_cache = {}
+
 
 def check_connection(session):
     """
@@ -155,8 +158,9 @@ class DB(object, metaclass=ABCMeta):
 
     def __init__(self, sqlalchemy_base, db_url):  # noqa
         self.sqlalchemy_base = CMDeclarativeBase
-        self.engine = create_engine(db_url)
-        self.sessionmaker.configure(bind=self.engine)
+        # Pooled connections are checked before use and recycled before server timeouts.
+        self.engine = create_engine(db_url, pool_pre_ping=True, pool_recycle=1800)
+        self.sessionmaker = sessionmaker(class_=CMSession, bind=self.engine)
 
 
 class DeclarativeDB(DB):
@@ -286,6 +290,9 @@ def connect_to_cm_db(args, check_connect=True, verbose=False):
     """
     Get a DB object that is connected to the CM database.
 
+    The DB object is made once per database url and then reused, so its engine's
+    connection pool is shared by all sessions in the process.
+
     Parameters
     ----------
     args : arguments
@@ -353,6 +360,12 @@ def connect_to_cm_db(args, check_connect=True, verbose=False):
             "the DB named {0!r} in {1!r}".format(db_name, config_path)
         )
 
+    db = _db_cache.get((db_mode, db_url))
+    if db is not None:
+        if verbose:
+            print(f"Using database {db_data['url']} ({db_name})")
+        return db
+
     if db_mode == "testing":
         db = DeclarativeDB(db_url)
     elif db_mode == "production":
@@ -376,6 +389,7 @@ def connect_to_cm_db(args, check_connect=True, verbose=False):
     if verbose:
         print(f"Using database {db_data['url']} ({db_name})")
 
+    _db_cache[(db_mode, db_url)] = db
     return db
 
 def get_script_path(mc_config_file=None, testing=False):
@@ -5,6 +5,7 @@
 
 """Methods to load all active data for a given date."""
 
+import sys
 from copy import copy
 from . import cm_utils, cm_tables
 
@@ -81,6 +82,7 @@ class ActiveData:
         """Reset all active attributes to None."""
         self.parts = None
         self.connections = None
+        self.connection_index = None
         self.info = None
         self.apriori = None
         self.stations = None
@@ -107,13 +109,16 @@ class ActiveData:
             gps seconds of at_date
 
         """
+        gps_time = self.at_date.gps
         if at_date is not None:
             this_date = cm_utils.get_astropytime(at_date, at_time, float_format)
-            if abs(this_date.gps - self.at_date.gps) > 1:
+            this_gps_time = this_date.gps
+            if abs(this_gps_time - gps_time) > 1:
                 print("New date does not agree with class date - resetting attributes.")
                 self.at_date = this_date
+                gps_time = this_gps_time
                 self.reset_all()
-        return self.at_date.gps
+        return gps_time
 
     def load_parts(self, at_date=None, at_time=None, float_format=None):
         """
@@ -159,6 +164,10 @@ class ActiveData:
                 self.connections - has keys 'up' and 'down', each of which
                                    is a dictionary keyed on part:rev for
                                    upstream_part and downstream_part respectively.
+                self.connection_index - keyed on (side, part, port) as for
+                                        self.connections, giving the
+                                        (part, port, connection) at the other end
+                                        with the part upper and port lower case.
 
         Parameters
         ----------
@@ -177,28 +186,38 @@ class ActiveData:
         """
         gps_time = self.set_active_time(at_date, at_time, float_format)
         self.connections = {"up": {}, "down": {}}
-        check_keys = {"up": [], "down": []}
+        self.connection_index = {}
+        up_connections = self.connections["up"]
+        down_connections = self.connections["down"]
+        connection_index = self.connection_index
+        check_up = set()
+        check_down = set()
         for cnn in self.session.query(cm_tables.Connections).filter(
             (cm_tables.Connections.start_gpstime <= gps_time)
             & (
                 (cm_tables.Connections.stop_gpstime > gps_time)
                 | (cm_tables.Connections.stop_gpstime == None)  # noqa
             )
-        ):
+        ).yield_per(1000):
             chk = f"{cnn.upstream_part}-{cnn.upstream_output_port}"
-            if chk in check_keys["up"]:
+            if chk in check_up:
                 raise ValueError("Duplicate active port {}".format(chk))
-            check_keys["up"].append(chk)
+            check_up.add(chk)
             chk = f"{cnn.downstream_part}-{cnn.downstream_input_port}"
-            if chk in check_keys["down"]:
+            if chk in check_down:
                 raise ValueError("Duplicate active port {}".format(chk))
-            check_keys["down"].append(chk)
-            key = cnn.upstream_part
-            self.connections["up"].setdefault(key, {})
-            self.connections["up"][key][cnn.upstream_output_port.lower()] = copy(cnn)
-            key = cnn.downstream_part
-            self.connections["down"].setdefault(key, {})
-            self.connections["down"][key][cnn.downstream_input_port.lower()] = copy(cnn)
+            check_down.add(chk)
+            # The copy keeps the loaded values once the session expires; up and down share it.
+            cnn = copy(cnn)
+            # Interned, since the hookup walk compares these against the (interned) sysdef ports.
+            up_port = sys.intern(cnn.upstream_output_port.lower())
+            down_port = sys.intern(cnn.downstream_input_port.lower())
+            up_connections.setdefault(cnn.upstream_part, {})[up_port] = cnn
+            down_connections.setdefault(cnn.downstream_part, {})[down_port] = cnn
+            connection_index[("up", cnn.upstream_part, up_port)] = (
+                sys.intern(cnn.downstream_part.upper()), down_port, cnn)
+            connection_index[("down", cnn.downstream_part, down_port)] = (
+                sys.intern(cnn.upstream_part.upper()), up_port, cnn)
 
     def load_info(self, at_date=None, at_time=None, float_format=None, bracket=False):
         """
@@ -234,10 +253,11 @@ class ActiveData:
             if self.info_date > self.at_date:
                 print(f"{self.info_date} shouldn't be after {self.at_date}")
                 print("But continuing anyway -- lower date is the Big Bang")
-        for info in self.session.query(cm_tables.PartInfo).filter(
-            (cm_tables.PartInfo.posting_gpstime <= gps_time) ):
-            if bracket and info.posting_gpstime < self.info_date.gps:
-                continue
+        query = self.session.query(cm_tables.PartInfo).filter(
+            cm_tables.PartInfo.posting_gpstime <= gps_time)
+        if bracket:
+            query = query.filter(cm_tables.PartInfo.posting_gpstime >= self.info_date.gps)
+        for info in query.yield_per(1000):
             key = info.pn
             self.info.setdefault(key, [])
             self.info[key].append(copy(info))
@@ -266,7 +286,7 @@ class ActiveData:
         """
         gps_time = self.set_active_time(at_date, at_time, float_format)
         self.apriori = {}
-        apriori_keys = []
+        apriori = self.apriori
         for astat in self.session.query(cm_tables.AprioriStatus).filter(
             (cm_tables.AprioriStatus.start_gpstime <= gps_time)
             & (
@@ -275,10 +295,9 @@ class ActiveData:
             )
         ):
             key = astat.pn
-            if key in apriori_keys:
+            if key in apriori:
                 raise ValueError(f"{key} already has an active apriori state.")
-            apriori_keys.append(key)
-            self.apriori[key] = copy(astat)
+            apriori[key] = copy(astat)
 
     def load_stations(self, at_date=None, at_time=None, float_format=None):
         """
@@ -5,8 +5,9 @@
 
 """Contains the Dossier and DossierEntry classes which serves as a "dossier" for part and hookup entries."""
 
-from argparse import Namespace
-from itertools import zip_longest
+from functools import lru_cache
+from itertools import chain, zip_longest
+from operator import attrgetter
 from . import cm_utils, cm_active
 
 
@@ -22,7 +23,8 @@ class Dossier:
         skip_pn_list_gather : bool
             If True, it won't try to update the provided pn
         active : self.active.ActiveData or list of modules to load (except info, which always gets loaded later)
-            If not list, use this ActiveData
+            If not list, use this ActiveData as-is (at_date etc are then ignored and the caller
+            owns its lifetime).  Modules already loaded on it are not reloaded.
         at_date : anything interpretable by cm_utils.get_astropytime
             Date for which to check.
         at_time : anything interpretable by cm_utils.get_astropytime
@@ -42,9 +44,11 @@ class Dossier:
         if skip_pn_list_gather:
             self.pn = pn
         else:
-            self.pn = cm_utils.get_pn_list(pn, list(self.active.parts.keys()), exact_match)
+            if self.active.parts is None:
+                self.active.load_parts()
+            self.pn = cm_utils.get_pn_list(pn, self.active.parts, exact_match)
 
-    def load_dossier(self, window=None):
+    def load_dossier(self, window=None, load_info=True):
         """
         Load the DossierEntry for the supplied part numbers.
 
@@ -56,6 +60,8 @@ class Dossier:
             If None, it is ignored
             If int, number of days (bracket [at_date-window, at_date])
             If str, it will pass through to cm_astropytime (bracket [window, at_date])
+        load_info : bool
+            If False, don't (re)load the part info (see uses_info).
 
         Attribute
         -------
@@ -65,14 +71,15 @@ class Dossier:
 
         """
 
-        if window is None:
-            bracket = False
-        else:
-            bracket = True
-            if not isinstance(window, str):
-                from datetime import timedelta
-                window = self.at_date.datetime - timedelta(days=window)
-        self.active.load_info(at_date=window, bracket=bracket)
+        if load_info:
+            if window is None:
+                bracket = False
+            else:
+                bracket = True
+                if not isinstance(window, str):
+                    from datetime import timedelta
+                    window = self.at_date.datetime - timedelta(days=window)
+            self.active.load_info(at_date=window, bracket=bracket)
 
         for this_pn in self.pn:
             this_part = DossierEntry(pn=this_pn)
@@ -80,7 +87,7 @@ class Dossier:
             if this_part.use:
                 self.dossier[this_pn] = this_part
 
-    def show_dossier(self, columns=None):
+    def show_dossier(self, columns=None, ports=None):
         """
         Generate part information print string.  Uses tabulate package.
 
@@ -88,6 +95,8 @@ class Dossier:
         ---------
         columns : list
             List of column headers to use.  If None, use all
+        ports : list or None
+            Allowed ports to show (for up./down. columns).  If None, show all
 
         Returns
         -------
@@ -96,18 +105,77 @@ class Dossier:
         """
         from tabulate import tabulate
 
-        pd_keys = cm_utils.put_keys_in_order(list(self.dossier.keys()))
+        dossier = self.dossier
+        pd_keys = cm_utils.put_keys_in_order(list(dossier))
         if len(pd_keys) == 0:
             return "Part not found"
-        table_data = []
-        headers = self.dossier[pd_keys[0]].get_headers(columns=columns)
-        for pn in pd_keys:
-            new_rows = self.dossier[pn].table_row(columns=columns)
-            for nr in new_rows:
-                table_data.append(nr)
+        headers = DossierEntry.get_headers(columns)
+        if ports is not None:
+            ports = frozenset(str(p).lower() for p in ports)
+        table_data = chain.from_iterable(
+            dossier[pn].iter_table_rows(columns, ports=ports) for pn in pd_keys
+        )
         return "\n" + tabulate(table_data, headers=headers, tablefmt="orgtbl") + "\n"
 
 
+_CONNECTION_COLS = frozenset(["input_ports", "output_ports"])
+_INFO_COLS = frozenset(["comment", "posting_gpstime", "reference", "pol"])
+_LIST_COLS = frozenset(["input_ports", "output_ports", "reference", "pol"])
+
+
+def get_active_modules(columns):
+    """
+    Return the ActiveData modules (other than info) needed to show the given columns.
+
+    Parameters
+    ----------
+    columns : list
+        List of the desired columns to use.
+
+    Returns
+    -------
+    list
+        Modules to pass as Dossier 'active'.
+    """
+    modules = ["parts"]
+    if any(col in _CONNECTION_COLS or col.startswith(("up.", "down.")) for col in columns):
+        modules.append("connections")
+    if "station" in columns:
+        modules.append("stations")
+    return modules
+
+
+def uses_info(columns):
+    """Return True if any of the columns needs the part info (see load_dossier)."""
+    return not _INFO_COLS.isdisjoint(columns)
+
+
+_MISSING = object()
+_part_info_fields = attrgetter("comment", "posting_gpstime", "reference", "pol")
+
+
+class _PartInfo:
+    """Lists of the part_info fields for a DossierEntry."""
+
+    __slots__ = ("comment", "posting_gpstime", "reference", "pol")
+
+    def __init__(self):
+        self.comment = []
+        self.posting_gpstime = []
+        self.reference = []
+        self.pol = []
+
+
+class _Connections:
+    """Upstream and downstream connections for a DossierEntry."""
+
+    __slots__ = ("up", "down")
+
+    def __init__(self, up=None, down=None):
+        self.up = up
+        self.down = down
+
+
 class DossierEntry:
     """
     Holds all of the information on a given part.
@@ -152,14 +220,16 @@ class DossierEntry:
         "down.stop_gpstime": "dStop",
     }
 
+    __slots__ = ("pn", "input_ports", "output_ports", "part", "part_info", "connections", "station", "use")
+
     def __init__(self, pn):
         self.pn = pn  # a single part number, not a list!
         # Below are the database components of the dossier
         self.input_ports = []
         self.output_ports = []
         self.part = None
-        self.part_info = Namespace(comment=[], posting_gpstime=[], reference=[], pol=[])
-        self.connections = Namespace(up=None, down=None)
+        self.part_info = _PartInfo()
+        self.connections = _Connections()
         self.station = None
 
     def __repr__(self):
@@ -178,15 +248,13 @@ class DossierEntry:
             Contains the active database entries
 
         """
-        if isinstance(active.parts, dict) and self.pn in active.parts:
-            self.part = active.parts[self.pn]
+        if isinstance(active.parts, dict):
+            self.part = active.parts.get(self.pn)
         if isinstance(active.connections, dict):
-            if self.pn in active.connections["up"]:
-                self.connections.up = active.connections["up"][self.pn]
-            if self.pn in active.connections["down"]:
-                self.connections.down = active.connections["down"][self.pn]
-        if isinstance(active.stations, dict) and self.pn in active.stations.keys():
-                self.station = active.stations[self.pn]
+            self.connections.up = active.connections["up"].get(self.pn)
+            self.connections.down = active.connections["down"].get(self.pn)
+        if isinstance(active.stations, dict):
+            self.station = active.stations.get(self.pn)
         self._get_part_info(active=active)
         self._add_ports()
 
@@ -194,10 +262,11 @@ class DossierEntry:
 
     def _add_ports(self):
         """Pull out the input_ports and output_ports to a class variable."""
+        # ActiveData.load_connections already keys the ports in lower case.
         if self.connections.down is not None:
-            self.input_ports = [x.lower() for x in self.connections.down.keys()]
+            self.input_ports = list(self.connections.down)
         if self.connections.up is not None:
-            self.output_ports = [x.lower() for x in self.connections.up.keys()]
+            self.output_ports = list(self.connections.up)
 
     def _get_part_info(self, active):
         """
@@ -209,16 +278,20 @@ class DossierEntry:
             Contains the active database entries.
 
         """
-        if isinstance(active.info, dict) and self.pn in active.info.keys():
-            for pi_entry in active.info[self.pn]:
-                self.part_info.comment.append(pi_entry.comment)
-                self.part_info.posting_gpstime.append(pi_entry.posting_gpstime)
-                self.part_info.reference.append(pi_entry.reference)
-                self.part_info.pol.append(pi_entry.pol)
-        else:
+        pi_entries = active.info.get(self.pn) if isinstance(active.info, dict) else None
+        if pi_entries is None:
             self.part_info = None
-
-    def get_headers(self, columns):
+            return
+        rows = [_part_info_fields(pi_entry) for pi_entry in pi_entries]
+        if rows:
+            comment, posting_gpstime, reference, pol = zip(*rows)
+            self.part_info.comment = list(comment)
+            self.part_info.posting_gpstime = list(posting_gpstime)
+            self.part_info.reference = list(reference)
+            self.part_info.pol = list(pol)
+
+    @classmethod
+    def get_headers(cls, columns):
         """
         Generate the header titles for the given columns.
 
@@ -234,10 +307,7 @@ class DossierEntry:
         list
             The list of the associated headers
         """
-        headers = []
-        for c in columns:
-            headers.append(self.col_hdr[c])
-        return headers
+        return list(_headers(cls, tuple(columns)))
 
     def table_row(self, columns, ports=None):
         """
@@ -247,95 +317,189 @@ class DossierEntry:
         ----------
         columns : list
             List of the desired columns to use.
-        ports : list
-            Allowed ports to show.
+        ports : list or frozenset
+            Allowed ports to show (a frozenset is assumed to already be lowercase).
 
         Returns
         -------
         list
             A row or rows for the tabulate display.
         """
-        # This section generates the appropriate ports to use, if necessary.
-        conns = [[None, None]]
-        ports_included = False
-        for col in columns:
-            if "up." in col or "down." in col:
-                ports_included = True
-                conns = zip_longest(
-                    [self.connections.down[x.lower()] for x in self.input_ports],
-                    [self.connections.up[x.lower()] for x in self.output_ports],
-                )
-                break
-        if ports_included and ports is not None:
-            new_up = []
-            new_dn = []
-            for up, down in conns:
-                if (
-                    up is None
-                    or up.upstream_output_port.lower() in ports
-                    or up.downstream_input_port.lower() in ports
-                ):
-                    new_up.append(up)
-                else:
-                    new_up.append(None)
-                if (
-                    down is None
-                    or down.upstream_output_port.lower() in ports
-                    or down.downstream_input_port.lower() in ports
-                ):
-                    new_dn.append(down)
-                else:
-                    new_up.append(None)
-            conns = zip(new_up, new_dn)
+        return list(self.iter_table_rows(columns, ports=ports))
+
+    def iter_table_rows(self, columns, ports=None):
+        """
+        Generate the rows for the tabulate display one at a time (see table_row).
+
+        Parameters
+        ----------
+        columns : list
+            List of the desired columns to use.
+        ports : list or frozenset
+            Allowed ports to show (a frozenset is assumed to already be lowercase).
+
+        Yields
+        ------
+        list
+            A row for the tabulate display.
+        """
+        plan = self._column_plan(columns)
+        if _PORT_COLS.isdisjoint(columns):
+            trow = self._simple_row(plan)
+            if trow is not None:
+                yield trow
+            return
+
+        # This section generates the appropriate ports to use.
+        down_conns = self.connections.down
+        up_conns = self.connections.up
+        conns = zip_longest(
+            (down_conns[x] for x in self.input_ports),
+            (up_conns[x] for x in self.output_ports),
+        )
+        if ports is not None:
+            if not isinstance(ports, frozenset):
+                ports = frozenset(str(p).lower() for p in ports)
+            conns = [(_port_filter(up, ports), _port_filter(down, ports)) for up, down in conns]
 
         # This section pulls the appropriate value for a given cell out of the data.
-        tdata = []
         for up, down in conns:
             trow = []
             no_port_data = True
             number_entries = 0
-            for col in columns:
-                cbeg = col.split(".")[0]
-                cend = col.split(".")[-1]
-                try:
-                    x = getattr(self, col)
-                except AttributeError:
-                    try:
-                        x = getattr(self.part, col)
-                    except AttributeError:
-                        try:
-                            x = getattr(self.part_info, col)
-                        except AttributeError:
-                            use = up if cbeg == "up" else down
-                            try:
-                                x = getattr(use, cend)
-                            except AttributeError:
-                                x = None
-                if cbeg in ["up", "down"] and x is not None:
-                    no_port_data = False
-                if col == "comment" and x is not None and len(x):
-                    x = "\n".join([y.strip() for y in x])
-                elif col == "station" and x is not None:
-                    x = "{:.1f}E, {:.1f}N, {:.1f}m".format(
-                        x.easting, x.northing, x.elevation
-                    )
-                elif cend in ["start_gpstime", "stop_gpstime"]:
-                    x = cm_utils.get_time_for_display(x, float_format="gps")
-                elif cend == "posting_gpstime":
-                    x = "\n".join(
-                        [
-                            cm_utils.get_time_for_display(y, float_format="gps")
-                            for y in x
-                        ]
-                    )
-                elif isinstance(x, (list, set)):
-                    x = ", ".join([str(tmp) for tmp in x])
+            for source, attr, fmt, x in plan:
+                if source is not None:
+                    x = getattr(up if source == "up" else down, attr, None)
+                    if source != "other" and x is not None:
+                        no_port_data = False
+                    if fmt is not None:
+                        x = fmt(x)
                 trow.append(x)
                 if x is not None and len(x):
                     number_entries += 1
-            if ports_included and no_port_data:
-                trow = None
-            if trow is not None and len(trow):
-                if number_entries > 1 or number_entries == len(columns):
-                    tdata.append(trow)
-        return tdata
+            if no_port_data:
+                continue
+            if len(trow) and (number_entries > 1 or number_entries == len(columns)):
+                yield trow
+
+    def _column_plan(self, columns):
+        """
+        Resolve where the value for each column comes from, once per table.
+
+        Values found on the entry, its part or its part_info are the same for every row and
+        are formatted here.  Otherwise the value is read from the up or down connection of
+        each row ('other' columns fall back to the down connection but are not port data).
+
+        Parameters
+        ----------
+        columns : list
+            List of the desired columns to use.
+
+        Returns
+        -------
+        list
+            (source, attr, fmt, value) for each column, where source is None for fixed values
+            and fmt is None if the value is shown as-is.
+        """
+        plan = []
+        for col in columns:
+            cbeg, cend = col.partition(".")[0], col.rpartition(".")[2]
+            fmt = _cell_formatter(col, cend)
+            for obj in (self, self.part, self.part_info):
+                x = getattr(obj, col, _MISSING)
+                if x is not _MISSING:
+                    plan.append((None, None, None, x if fmt is None else fmt(x)))
+                    break
+            else:
+                source = cbeg if cbeg in ("up", "down") else "other"
+                plan.append((source, cend, fmt, None))
+        return plan
+
+    def _simple_row(self, plan):
+        """
+        Generate the single table row for columns that contain no port (up./down.) entries.
+
+        Parameters
+        ----------
+        plan : list
+            Column plan from _column_plan.
+
+        Returns
+        -------
+        list or None
+            The table row, or None if there isn't enough information to show.
+        """
+        trow = []
+        number_entries = 0
+        for source, attr, fmt, x in plan:
+            if source is not None:
+                x = None if fmt is None else fmt(None)
+            trow.append(x)
+            if x is not None and len(x):
+                number_entries += 1
+        if len(trow) and (number_entries > 1 or number_entries == len(trow)):
+            return trow
+        return None
+
+
+def _port_filter(conn, ports):
+    """Return conn if it is None or either of its ports is in ports, otherwise None."""
+    if (
+        conn is None
+        or conn.upstream_output_port.lower() in ports
+        or conn.downstream_input_port.lower() in ports
+    ):
+        return conn
+    return None
+
+
+def _fmt_comment(x):
+    if x is None:
+        return None
+    return "\n".join([y.strip() for y in x])
+
+
+def _fmt_station(x):
+    if x is None:
+        return None
+    return "{:.1f}E, {:.1f}N, {:.1f}m".format(x.easting, x.northing, x.elevation)
+
+
+def _fmt_gps(x):
+    return cm_utils.get_time_for_display(x, float_format="gps")
+
+
+def _fmt_posting(x):
+    if x is None:
+        return None
+    return "\n".join([cm_utils.get_time_for_display(y, float_format="gps") for y in x])
+
+
+def _fmt_join(x):
+    if x is None:
+        return None
+    return ", ".join([str(tmp) for tmp in x])
+
+
+def _cell_formatter(col, cend):
+    """Return the display formatting function for column col (attribute cend), or None."""
+    if col == "comment":
+        return _fmt_comment
+    if col == "station":
+        return _fmt_station
+    if cend in ["start_gpstime", "stop_gpstime"]:
+        return _fmt_gps
+    if cend == "posting_gpstime":
+        return _fmt_posting
+    if col in _LIST_COLS:
+        return _fmt_join
+    return None
+
+
+_PORT_COLS = frozenset(k for k in DossierEntry.col_hdr if "." in k)
+
+
+@lru_cache(maxsize=32)
+def _headers(entry_class, columns):
+    """Return the entry_class header titles for a tuple of columns."""
+    return tuple(entry_class.col_hdr[c] for c in columns)
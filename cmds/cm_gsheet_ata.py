@@ -1,26 +1,275 @@
 """Class for config gsheet."""
 import csv
+import io
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os.path
+import json
+import gzip
+import base64
+import hashlib
+import time
+import atexit
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from warnings import warn
 
 
 gsheet_prefix = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vR40OGLUdmYOnIWogF1SxeP2FgSmmsNOuYR3vGR2n0XmjJq_Tv0MBViGt6fPTQkhtaXVmAyG2FuzzA5/pub?'
 gsheet = {}
 gsheet['Antenna'] = 'gid=0&single=true&output=csv'
 gsheet['Tuning'] = 'gid=616087514&single=true&output=csv'
+# Full urls, built once here (gsheet itself stays un-prefixed for scripts).
+gsheet_url = MappingProxyType({key: gsheet_prefix + val for key, val in gsheet.items()})
 
 no_prefix = ['Comments']
 
+# If CMDS_GSHEET_ID and CMDS_GSHEET_API_KEY are both set, tabs are read with a single
+# Sheets API batchGet request (see SheetData.load_sheet).
+gsheet_batch_url = 'https://sheets.googleapis.com/v4/spreadsheets/{}/values:batchGet'
+
+# Most tabs fetched at once.  The one shared requests.Session pools this many connections
+# (urllib3's pool is thread-safe), so connections are reused across tabs and loads.
+max_fetch_workers = 16
+_http_session = None
+
+
+def _get_session():
+    """Return the shared requests.Session, with retry/backoff on throttling and server errors."""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(
+            pool_connections=max_fetch_workers, pool_maxsize=max_fetch_workers,
+            max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                              respect_retry_after_header=True)))
+        session.headers.update({'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'cmds'})
+        _http_session = session
+    return _http_session
+
+
+def close_session():
+    """Close the shared session and its pooled connections (a new one is made when next needed)."""
+    global _http_session
+    if _http_session is not None:
+        _http_session.close()
+        _http_session = None
+
+
+atexit.register(close_session)
+
+
+# In-process memo of the last decoded body of each url:  url -> (monotonic fetch time, body)
+_url_cache = {}
+
+
+def get_memoized_text(url, max_age=0):
+    """Return the body fetched for url within the last max_age seconds (or None)."""
+    entry = _url_cache.get(url)
+    if max_age <= 0 or entry is None or time.monotonic() - entry[0] > max_age:
+        return None
+    return entry[1]
+
+
+def memoize_text(url, body):
+    """Keep body as the latest response for url (successful responses only)."""
+    _url_cache[url] = (time.monotonic(), body)
+
+
+def get_response_cache_dir(max_age=0):
+    """
+    Return the directory of the conditional-request cache of the tab responses.
+
+    The cache is only used if the environment variable CMDS_CACHE_DIR is set (to a
+    non-empty directory name), or if max_age > 0, when it defaults to cmds under
+    XDG_CACHE_HOME (or ~/.cache).
+
+    Parameters
+    ----------
+    max_age : float
+        max_age of the fetch (see SheetData.load_sheet).
+
+    Returns
+    -------
+    str or None
+        Directory name, or None if responses are not cached.
+    """
+    cache_dir = os.environ.get('CMDS_CACHE_DIR')
+    if cache_dir is None and max_age > 0:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'cmds')
+    return cache_dir or None
+
+
+def _response_cache_file(cache_dir, url):
+    """Return the response cache filename for url."""
+    return os.path.join(cache_dir, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json")
+
+
+def read_response_cache(url, cache_dir):
+    """
+    Read the cached response for url.
+
+    Parameters
+    ----------
+    url : str
+        URL of the cached response.
+    cache_dir : str or None
+        Directory of the response cache, None if not caching.
+
+    Returns
+    -------
+    dict or None
+        Dictionary with keys 'etag', 'last_modified' and 'body', or None if not cached.
+    """
+    if not cache_dir:
+        return None
+    try:
+        with open(_response_cache_file(cache_dir, url), 'r') as fp:
+            cached = json.load(fp)
+        cached['body'] = gzip.decompress(base64.b64decode(cached.pop('body_gz'))).decode('utf-8')
+    except (OSError, ValueError, KeyError):
+        return None
+    return cached
+
+
+def write_response_cache(url, etag, last_modified, body, cache_dir):
+    """
+    Write the response for url to the cache, compressing the body.
+
+    Nothing is written if caching is off, and a failed write (e.g. a read-only home
+    directory) is ignored:  the tab is then just fetched in full the next time.
+
+    Parameters
+    ----------
+    url : str
+        URL of the response.
+    etag : str or None
+        ETag header of the response.
+    last_modified : str or None
+        Last-Modified header of the response.
+    body : str
+        Decoded body of the response.
+    cache_dir : str or None
+        Directory of the response cache, None if not caching.
+    """
+    if not cache_dir:
+        return
+    body_gz = base64.b64encode(gzip.compress(body.encode('utf-8'))).decode('ascii')
+    cache_file = _response_cache_file(cache_dir, url)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_file, 'w') as fp:
+            json.dump({'etag': etag, 'last_modified': last_modified, 'body_gz': body_gz}, fp)
+        os.replace(tmp_file, cache_file)  # so other processes never read a partial file
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def revalidation_headers(cached):
+    """Return the conditional request headers for a cached response (or None)."""
+    headers = {}
+    if cached is not None:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+class CachedFetch:
+    """
+    Memo and response-cache handling around one fetch of a url.
+
+    The caller only makes the request:  a memoized body younger than max_age is used as
+    is, otherwise the request is made conditional on the cached response (if caching, see
+    get_response_cache_dir).  Only successful responses are cached or memoized.
+
+    Parameters
+    ----------
+    url : str
+        URL to fetch.
+    max_age : float
+        Age in seconds up to which a body fetched earlier in this process is reused.
+
+    Attributes
+    ----------
+    body : str or None
+        The decoded body, None until fetched (or if the fetch failed).
+    headers : dict
+        Conditional request headers to send.
+    """
+
+    def __init__(self, url, max_age=0):
+        self.url = url
+        self.cache_dir = get_response_cache_dir(max_age)
+        self.body = get_memoized_text(url, max_age)
+        self.cached = None if self.body is not None else read_response_cache(url, self.cache_dir)
+        self.headers = revalidation_headers(self.cached)
+
+    def finish(self, status, headers, content, raise_for_status):
+        """
+        Set body from the response, updating the response cache and the memo.
+
+        Parameters
+        ----------
+        status : int
+            HTTP status of the response.
+        headers : dict
+            Headers of the response.
+        content : bytes
+            Body of the response.
+        raise_for_status : callable
+            The response's raise_for_status, called for anything but 200/304.
+
+        Raises
+        ------
+        Exception
+            Whatever raise_for_status raises for an error status.
+        """
+        if status == 304 and self.cached is not None:
+            body = self.cached['body']
+        else:
+            if status not in (200, 304):
+                raise_for_status()
+            body = content.decode('utf-8')
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            if status == 200 and (etag or last_modified):
+                write_response_cache(self.url, etag, last_modified, body, self.cache_dir)
+        memoize_text(self.url, body)
+        self.body = body
+
+    def failed(self):
+        """Report a failed fetch (call from within the except clause)."""
+        e = sys.exc_info()[0]
+        print(f"Error reading {self.url}: {e}")
+        self.body = None
+
+
+def _strip_intern(row):
+    """Return the stripped cells of row, interning the short (often repeated) ones."""
+    stripped = [_x.strip() for _x in row]
+    return [sys.intern(_x) if len(_x) <= 16 else _x for _x in stripped]
+
+
+def write_csv(filename, csv_text):
+    """Write the csv contents to filename, one line per row."""
+    with open(filename, 'w') as fp:
+        fp.write('\n'.join(csv_text.splitlines()))
+
 
 class SheetData:
     """Class for googlesheet."""
 
     def __init__(self):
         """Initialize dictionaries/lists."""
-        self.tabs = []
-        for key in gsheet.keys():
-            gsheet[key] = gsheet_prefix + gsheet[key]
-            self.tabs.append(key)
+        self.tabs = list(gsheet_url)
         # It reads into the variables below
         self.header = {}
         self.ants = {}
@@ -30,7 +279,12 @@ class SheetData:
         self.snaps = {}
         self.obs = set()
 
-    def load_sheet(self, arc_csv='none', tabs=None, path='.', time_tag='%y%m%d'):
+    @classmethod
+    def invalidate_cache(cls):
+        """Forget the responses memoized in this process."""
+        _url_cache.clear()
+
+    def load_sheet(self, arc_csv='none', tabs=None, path='.', time_tag='%y%m%d', max_age=0):
         """
         Get the googlesheet information from the internet (or locally for testing etc).
 
@@ -47,6 +301,21 @@ class SheetData:
             Path to use if reading/writing csv files.
         time_tag : str
             If non-zero length string use as time_tag format for the output files (if arc_csv=w).
+        max_age : float
+            If > 0, reuse tabs fetched by this process within the last max_age seconds
+            rather than asking the server again (0 always asks).
+
+        Notes
+        -----
+        If the environment variables CMDS_GSHEET_ID and CMDS_GSHEET_API_KEY are set (and
+        arc_csv is 'none' and max_age is 0) all tabs are read with one Sheets API batchGet.
+        That response has no validators, so it is not memoized or put in the response
+        cache:  with max_age > 0 the csv export of each tab is used instead.
+
+        Raises
+        ------
+        OSError
+            If any of the tabs could not be read from the internet.
         """
         arc_csv = arc_csv[0].lower()
         if tabs is None or str(tabs) == 'all':
@@ -58,85 +327,181 @@ class SheetData:
             ttag = f"_{datetime.strftime(datetime.now(), time_tag)}"
         else:
             ttag = ""
-        check_rfcb_part_port = []
-        check_rfsoc_part_port = []
-        check_snap_part_port = []
-        for tab in tabs:
-            obs_line_reached = False
-            ofnc = os.path.join(path, f"{tab}{ttag}.csv")
-            if arc_csv == 'r':
-                csv_data = []
-                with open(ofnc, 'r') as fp:
-                    for line in fp:
-                        csv_data.append(line)
-            else:
-                try:
-                    xxx = requests.get(gsheet[tab])
-                except:  # noqa
-                    import sys
-                    e = sys.exc_info()[0]
-                    print(f"Error reading {gsheet[tab]}: {e}")
-                    return
-                csv_tab = b''
-                for line in xxx:
-                    csv_tab += line
-                csv_data = csv_tab.decode('utf-8').splitlines()
-            csv_tab = csv.reader(csv_data)
-            if arc_csv == 'w':
-                with open(ofnc, 'w') as fp:
-                    fp.write('\n'.join(csv_data))
-            for data in csv_tab:
-                if data[0].startswith('$'):
+        write_pool = None
+        writes = []
+        tab_rows = None
+        if arc_csv == 'r':
+            tab_rows = []
+            for tab in tabs:
+                with open(os.path.join(path, f"{tab}{ttag}.csv"), 'r') as fp:
+                    tab_rows.append((tab, csv.reader(io.StringIO(fp.read()))))
+        elif arc_csv == 'n' and max_age <= 0:
+            gsheet_id = os.environ.get('CMDS_GSHEET_ID')
+            gsheet_api_key = os.environ.get('CMDS_GSHEET_API_KEY')
+            if gsheet_id and gsheet_api_key:
+                tab_rows = self._fetch_tabs_batch(tabs, _get_session(), gsheet_id,
+                                                  gsheet_api_key)  # None if it failed
+        if tab_rows is None:
+            session = _get_session()
+            with ThreadPoolExecutor(max_workers=max(1, min(max_fetch_workers, len(tabs)))) as ex:
+                fetched = list(ex.map(lambda tab: self._fetch_tab(tab, session, max_age), tabs))
+            failed = [tab for tab, csv_text in fetched if csv_text is None]
+            if len(failed):
+                raise OSError(f"Could not read the googlesheet tab(s) {', '.join(failed)}.")
+            if arc_csv == 'w':  # Write the files in the background while parsing.
+                write_pool = ThreadPoolExecutor(max_workers=2)
+                writes = [write_pool.submit(write_csv, os.path.join(path, f"{tab}{ttag}.csv"),
+                                            csv_text) for tab, csv_text in fetched]
+            tab_rows = [(tab, csv.reader(io.StringIO(csv_text))) for tab, csv_text in fetched]
+        check_part_port = {'rfcb': set(), 'rfsoc': set(), 'snap': set()}
+        try:
+            for tab, rows in tab_rows:
+                self._parse_tab(tab, rows, check_part_port)
+        finally:  # The files are finished even if parsing fails.
+            if write_pool is not None:
+                write_pool.shutdown(wait=True)
+        for write in writes:
+            write.result()
+
+    def _fetch_tabs_batch(self, tabs, session, gsheet_id, gsheet_api_key):
+        """
+        Get the rows of all tabs with one Sheets API batchGet request.
+
+        Expects the sheet names to match the tab names.  Rows are padded to the width of
+        their tab, as in the csv export.  If the request fails, load_sheet falls back to
+        fetching the csv export of each tab.
+
+        Parameters
+        ----------
+        tabs : list
+            Names of tabs to get.
+        session : requests.Session
+            Session to use for the request.
+        gsheet_id : str
+            Id of the googlesheet.
+        gsheet_api_key : str
+            Sheets API key.
+
+        Returns
+        -------
+        list or None
+            List of (tab, list of rows), or None if the request failed.
+        """
+        url = gsheet_batch_url.format(gsheet_id)
+        params = [('ranges', tab) for tab in tabs] + [('key', gsheet_api_key)]
+        try:
+            xxx = session.get(url, params=params, timeout=(5, 30))
+            xxx.raise_for_status()
+            value_ranges = xxx.json()['valueRanges']
+            if len(value_ranges) != len(tabs):
+                raise ValueError(f"{len(value_ranges)} ranges returned for {len(tabs)} tabs")
+        except:  # noqa
+            e = sys.exc_info()[0]
+            print(f"Error reading {url}: {e} - using the csv export.")
+            return None
+        tab_rows = []
+        for tab, value_range in zip(tabs, value_ranges):
+            values = value_range.get('values', [])
+            width = max([len(row) for row in values], default=0)
+            tab_rows.append((tab, [row + [''] * (width - len(row)) for row in values]))
+        return tab_rows
+
+    def _fetch_tab(self, tab, session, max_age=0):
+        """
+        Get the csv contents of one tab from the internet.
+
+        A conditional GET is used if the tab is in the response cache, so unchanged
+        tabs are read from the cache rather than re-downloaded.
+
+        Parameters
+        ----------
+        tab : str
+            Name of tab to get.
+        session : requests.Session
+            Session shared between the fetching threads.
+        max_age : float
+            Age in seconds up to which a body memoized in this process is reused.
+
+        Returns
+        -------
+        tuple
+            (tab, csv contents), where the contents are None if the request failed.
+        """
+        fetch = CachedFetch(gsheet_url[tab], max_age)
+        if fetch.body is None:
+            try:
+                xxx = session.get(fetch.url, headers=fetch.headers, timeout=(5, 30))
+                fetch.finish(xxx.status_code, xxx.headers, xxx.content, xxx.raise_for_status)
+            except:  # noqa
+                fetch.failed()
+        return tab, fetch.body
+
+    def _parse_tab(self, tab, rows, check_part_port):
+        """
+        Parse the rows of one tab into the class variables.
+
+        Parameters
+        ----------
+        tab : str
+            Name of tab the rows are from.
+        rows : iterable
+            Rows of the tab, each a list of cell strings.
+        check_part_port : dict
+            Part:port entries already read, used to check for duplicates across tabs.
+        """
+        row_parser = self._row_parsers.get(tab)
+        obs_line_reached = False
+        obs_add = self.obs.add
+        for data in rows:
+            first = data[0]
+            if first.startswith(('$', '#')):  # One check for the common data row
+                if first[0] == '$':
                     self.header[tab] = [_x.strip('$') for _x in data]
-                    continue
-                elif data[0].startswith('#'):
-                    if data[0].startswith('#Obs'):
-                        obs_line_reached = True
-                    continue
-                if obs_line_reached:  # Everything relates to observatory overall
-                    for cell in data:
-                        if len(cell):
-                            self.obs.add(cell)
-                elif tab == 'Antenna':
-                    this_ant = data[0].upper()
-                    if this_ant in self.ants:
-                        raise ValueError(f"{this_ant} is already present.")
-                    self.ants[this_ant] = [_x.strip() for _x in data]
-                elif tab == 'Tuning':
-                    # Tunings
-                    rpoltune = data[0].split(':')
-                    this_rfcb = int(rpoltune[0])
-                    this_pol = rpoltune[1][0]
-                    this_tuning = rpoltune[1][1]
-                    self.tunings.setdefault(this_pol, {})
-                    self.tunings[this_pol].setdefault(this_tuning, {})
-                    self.tunings[this_pol][this_tuning].setdefault(this_rfcb, [])
-                    self.tunings[this_pol][this_tuning][this_rfcb].append([_x.strip() for _x in data])
-                    self.rfcbs.setdefault(this_rfcb, [])
-                    this_part_port = f"{this_rfcb}:{rpoltune[1].strip()}"
-                    if this_part_port in check_rfcb_part_port:
-                        raise ValueError(f"{this_part_port} already present.")
-                    self.rfcbs[this_rfcb].append(data)
-                    # RFSoCs
-                    tmp = data[2].split(':')
-                    if len(tmp) == 2:
-                        this_rfsoc = int(tmp[0])
-                        self.rfsocs.setdefault(this_rfsoc, [])
-                        this_port = int(tmp[1])
-                        this_part_port = f"{this_rfsoc}:{this_port}"
-                        if this_part_port in check_rfsoc_part_port:
-                            raise ValueError(f"{this_part_port} is already present.")
-                        self.rfsocs[this_rfsoc].append(data)
-                    # SNAPs
-                    tmp = data[3].split(':')
-                    if len(tmp) == 2:
-                        this_snap = int(tmp[0])
-                        self.snaps.setdefault(this_snap, [])
-                        this_port = tmp[1].lower()
-                        this_part_port = f"{this_snap}:{this_port}"
-                        if this_part_port in check_snap_part_port:
-                            raise ValueError(f"{this_part_port} is already present.")
-                        self.snaps[this_snap].append(data)
+                elif first.startswith('#Obs'):
+                    obs_line_reached = True
+            elif obs_line_reached:  # Everything relates to observatory overall
+                for cell in data:
+                    if len(cell):
+                        obs_add(cell)
+            elif row_parser is not None:
+                row_parser(self, data, check_part_port)
+
+    def _parse_antenna_row(self, data, check_part_port):
+        """Parse a data row of the Antenna tab."""
+        this_ant = data[0].upper()
+        if this_ant in self.ants:
+            raise ValueError(f"{this_ant} is already present.")
+        self.ants[this_ant] = _strip_intern(data)
+
+    def _parse_tuning_row(self, data, check_part_port):
+        """
+        Parse a data row of the Tuning tab.
+
+        A rfcb, rfsoc or snap part:port already read gives a warning, but the row is kept.
+        """
+        rpoltune = data[0].split(':')
+        this_rfcb = int(rpoltune[0])
+        this_pol = rpoltune[1][0]
+        this_tuning = rpoltune[1][1]
+        row_part_ports = {'rfcb': (this_rfcb, f"{this_rfcb}:{rpoltune[1].strip()}")}
+        tmp = data[2].split(':')
+        if len(tmp) == 2:
+            row_part_ports['rfsoc'] = (int(tmp[0]), f"{int(tmp[0])}:{int(tmp[1])}")
+        tmp = data[3].split(':')
+        if len(tmp) == 2:
+            row_part_ports['snap'] = (int(tmp[0]), f"{int(tmp[0])}:{tmp[1].lower()}")
+        # Check everything before anything is added
+        for ptype, (_, this_part_port) in row_part_ports.items():
+            if this_part_port in check_part_port[ptype]:
+                warn(f"{ptype} {this_part_port} is already present.")
+        (self.tunings.setdefault(this_pol, {}).setdefault(this_tuning, {})
+         .setdefault(this_rfcb, []).append(_strip_intern(data)))
+        part_rows = {'rfcb': self.rfcbs, 'rfsoc': self.rfsocs, 'snap': self.snaps}
+        for ptype, (this_part, this_part_port) in row_part_ports.items():
+            check_part_port[ptype].add(this_part_port)
+            part_rows[ptype].setdefault(this_part, []).append(data)
+
+    _row_parsers = {'Antenna': _parse_antenna_row, 'Tuning': _parse_tuning_row}
 
     def split_apriori(self, tab='Antenna', hdr='A Priori Status', prepend='A'):
         self.apriori = {}
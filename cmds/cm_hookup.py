@@ -5,7 +5,6 @@
 
 """Find and display part hookups."""
 
-from argparse import Namespace
 from copy import copy
 
 from . import cm_utils, cm_sysdef, cm_dossier, cm_active
@@ -20,6 +19,7 @@ def get_hookup(
     exact_match=False,
     hookup_type=None,
     show=True,
+    session=None,
 ):
     """
     Return a hookup object.
@@ -53,6 +53,11 @@ def get_hookup(
         If 'None' it will determine which system it thinks it is based on
         the part-type.  The order in which it checks is specified in cm_sysdef.
         Only change if you know you want a different system (like 'parts_paper').
+    show : bool
+        Flag to print the hookup table.
+    session : session
+        session on current database. If session is None, a new session
+        on the default database is created and used.
 
     Returns
     -------
@@ -62,7 +67,7 @@ def get_hookup(
     """
     from . import cm
 
-    with cm.CMSessionWrapper() as session:
+    with cm.CMSessionWrapper(session) as session:
         hookup = Hookup(session=session)
         hookup.get_hookup(
             pn=pn,
@@ -78,6 +83,27 @@ def get_hookup(
         return hookup
 
 
+def column_index(cols):
+    """
+    Return the position of the first occurrence of each column.
+
+    Parameters
+    ----------
+    cols : list
+        Column names
+
+    Returns
+    -------
+    dict
+        Index into cols, keyed on column name.
+
+    """
+    col_index = {}
+    for i, col in enumerate(cols):
+        col_index.setdefault(col, i)
+    return col_index
+
+
 class Hookup(object):
     """
     Class to find and display the signal path hookup information.
@@ -136,26 +162,66 @@ class Hookup(object):
             self.active = active
         self.active.load_parts(at_date=None)
         self.active.load_connections(at_date=None)
-        parts_list = cm_utils.get_pn_list(pn, list(self.active.parts.keys()), exact_match)
+        parts_list = cm_utils.get_pn_list(pn, self.active.parts, exact_match)
         self.dossier = cm_dossier.Dossier(pn=parts_list, skip_pn_list_gather=True, active=self.active)
-        self.dossier.load_dossier(window=None)
+        self.dossier.load_dossier(load_info=False)  # only the ports are used here
         self.hookup = {}
+        self.part_type_cache = {}
+        self._stream_cache = {}  # one-direction walks, keyed on (part, pol, port, direction)
+        port_sets = {}  # frozensets of sysdef ports, keyed on (ptype, direction, signal_path)
+        port_orders = {}  # display orders of hookup ports, shared between entries
         for this_part in parts_list:
-            part = self.active.parts[this_part]
-            self.hookup[this_part] = HookupEntry(entry_key=this_part, sysdef=self.sysdef)
+            ptype = self.active.parts[this_part].ptype
+            dossier_entry = self.dossier.dossier[this_part]
+            hookup_entry = HookupEntry(entry_key=this_part, sysdef=self.sysdef)
+            self.hookup[this_part] = hookup_entry
             for this_signal_path in self.sysdef.signal_paths:
-                self.hookup[this_part]._strm['up'][this_signal_path] = {}
-                for this_port in self.dossier.dossier[this_part].input_ports:
-                    if this_port in self.sysdef.components[part.ptype]['up'][this_signal_path]:
-                        self.hookup[this_part]._strm['up'][this_signal_path][this_port] = self._follow_hookup(
-                            part=this_part, pol=this_signal_path, port=this_port, dir="up")
-                self.hookup[this_part]._strm['down'][this_signal_path] = {}
-                for this_port in self.dossier.dossier[this_part].output_ports:
-                    if this_port in self.sysdef.components[part.ptype]['down'][this_signal_path]:
-                        self.hookup[this_part]._strm['down'][this_signal_path][this_port] = self._follow_hookup(
-                            part=this_part, pol=this_signal_path, port=this_port, dir="down")
-            self.hookup[this_part].consolidate_strm2hookup()
-            self.hookup[this_part].add_extras(self.part_type_cache)
+                up_strm = hookup_entry._strm['up'][this_signal_path] = {}
+                if len(dossier_entry.input_ports):
+                    up_ports = self._get_port_set(port_sets, ptype, 'up', this_signal_path)
+                    for this_port in dossier_entry.input_ports:
+                        if this_port in up_ports:
+                            up_strm[this_port] = self._follow_hookup(
+                                part=this_part, pol=this_signal_path, port=this_port, dir="up")
+                down_strm = hookup_entry._strm['down'][this_signal_path] = {}
+                if len(dossier_entry.output_ports):
+                    down_ports = self._get_port_set(port_sets, ptype, 'down', this_signal_path)
+                    for this_port in dossier_entry.output_ports:
+                        if this_port in down_ports:
+                            down_strm[this_port] = self._follow_hookup(
+                                part=this_part, pol=this_signal_path, port=this_port, dir="down")
+            hookup_entry.consolidate_strm2hookup()
+            hookup_entry.add_extras(self.part_type_cache)
+            hookup_entry.sort_ports(port_orders)
+
+    def _get_port_set(self, port_sets, ptype, direction, signal_path):
+        """
+        Return the sysdef ports of a part type as a frozenset, made the first time it is asked for.
+
+        Only parts with ports ask, so the sysdef component need not have the signal path otherwise
+        (e.g. a control-box has only 'ctrl').
+
+        Parameters
+        ----------
+        port_sets : dict
+            Frozensets already made, keyed on (ptype, direction, signal_path).
+        ptype : str
+            Part type.
+        direction : str
+            'up' or 'down'.
+        signal_path : str
+            Signal path of the ports.
+
+        Returns
+        -------
+        frozenset
+            Ports of the part type in that direction and signal path.
+
+        """
+        key = (ptype, direction, signal_path)
+        if key not in port_sets:
+            port_sets[key] = frozenset(self.sysdef.components[ptype][direction][signal_path])
+        return port_sets[key]
 
     def _make_header_row(self, cols_to_show, timing):
         """
@@ -180,13 +246,21 @@ class Hookup(object):
             headers = self.sysdef.hookup + []
         else:
             self.col_list = []
+            col_set = set()
+            columns_seen = set()  # entries share the sysdef columns, so only new lists get scanned
             for h in self.hookup.values():
-                for col in h.columns:
-                    if col not in self.col_list:
-                        self.col_list.append(col.lower())
+                columns = tuple(h.columns)
+                if columns in columns_seen:
+                    continue
+                columns_seen.add(columns)
+                for col in columns:
+                    lcol = col.lower()
+                    if lcol not in col_set:
+                        col_set.add(lcol)
+                        self.col_list.append(lcol)
             headers = []
             for col in cols_to_show:
-                if col.lower() in self.col_list:
+                if col.lower() in col_set:
                     headers.append(col)
         if timing:
             headers += ['start', 'stop']
@@ -233,18 +307,25 @@ class Hookup(object):
         if signal_paths_to_show == 'all':
             signal_paths_to_show = self.sysdef.signal_paths
         headers = self._make_header_row(cols_to_show, timing=timing)
+        col_index = column_index(headers)
         table_data = []
+        rows_seen = set()
         total_shown = 0
+        this_state = state.lower()
         sorted_hukeys = self._sort_hookup_display(sortby, def_sort_order="NP")
         for hukey in sorted_hukeys:
             for this_signal_path in signal_paths_to_show:
-                for this_port in cm_utils.put_keys_in_order(self.hookup[hukey].hookup[this_signal_path].keys(), sort_order="PN"):  # noqa
-                    if self.hookup[hukey].hookup[this_signal_path][this_port] is not None and len(self.hookup[hukey].hookup[this_signal_path][this_port]):  # noqa
-                        this_state, is_full = state.lower(), self.hookup[hukey].fully_connected[this_signal_path][this_port]  # noqa
+                sp_hookup = self.hookup[hukey].hookup[this_signal_path]
+                for this_port in self.hookup[hukey].ports_in_order(this_signal_path):
+                    if sp_hookup[this_port] is not None and len(sp_hookup[this_port]):
+                        is_full = self.hookup[hukey].fully_connected[this_signal_path][this_port]
                         if this_state == "all" or (this_state == "full" and is_full):
                             total_shown += 1
-                            td = self.hookup[hukey].table_entry_row(this_signal_path, this_port, headers, show)
-                            if td not in table_data:
+                            td = self.hookup[hukey].table_entry_row(
+                                this_signal_path, this_port, headers, show, col_index=col_index)
+                            row_key = tuple(td)
+                            if row_key not in rows_seen:
+                                rows_seen.add(row_key)
                                 table_data.append(td)
         if total_shown == 0:
             print("None found for {} (show-state is {})".format(
@@ -278,31 +359,31 @@ class Hookup(object):
             self.active = cm_active.ActiveData(self.session, at_date=self.at_date)
         if self.active.info is None:
             self.active.load_info(self.at_date)
-        info_keys = list(self.active.info.keys())
+        info = self.active.info
         self.notes = {}
         for hkey in self.hookup.keys():
             all_hu_hpn = set()
-            for pol in self.hookup[hkey].hookup.keys():
-                for hpn in self.hookup[hkey].hookup[pol]:
+            for pol, pol_hookup in self.hookup[hkey].hookup.items():
+                for port, conns in pol_hookup.items():
                     if state == "all" or (
-                        state == "full" and self.hookup[hkey].fully_connected[pol]
+                        state == "full" and self.hookup[hkey].fully_connected[pol][port]
                     ):
-                        all_hu_hpn.add(hpn.upstream_part)
-                        all_hu_hpn.add(hpn.downstream_part)
+                        for hpn in conns:
+                            all_hu_hpn.add(hpn.upstream_part)
+                            all_hu_hpn.add(hpn.downstream_part)
             self.notes[hkey] = {}
-            for ikey in all_hu_hpn:
-                if ikey in info_keys:
-                    self.notes[hkey][ikey] = {}
-                    for entry in self.active.info[ikey]:
-                        if return_dict:
-                            self.notes[hkey][ikey][entry.posting_gpstime] = {
-                                "note": entry.comment.replace("\\n", "\n"),
-                                "ref": entry.reference,
-                            }
-                        else:
-                            self.notes[hkey][ikey][
-                                entry.posting_gpstime
-                            ] = entry.comment.replace("\\n", "\n")
+            for ikey in all_hu_hpn.intersection(info):
+                self.notes[hkey][ikey] = {}
+                for entry in info[ikey]:
+                    if return_dict:
+                        self.notes[hkey][ikey][entry.posting_gpstime] = {
+                            "note": entry.comment.replace("\\n", "\n"),
+                            "ref": entry.reference,
+                        }
+                    else:
+                        self.notes[hkey][ikey][
+                            entry.posting_gpstime
+                        ] = entry.comment.replace("\\n", "\n")
 
     def show_notes(self, state="all"):
         """
@@ -355,7 +436,7 @@ class Hookup(object):
         pol : str
             Polarization designation
         port : str
-            Port designation
+            Port designation (lower case, as in the dossier ports)
         dir : str
             Direction to follow (up or down)
 
@@ -365,97 +446,91 @@ class Hookup(object):
             List of connections for that hookup.
 
         """
-        stream = {'up': [], 'down': []}
+        stream = {}
         starting_part = part.upper()
         starting_part_type = self.active.parts[part].ptype
-        self.part_type_cache = {starting_part: starting_part_type}
-        current = Namespace(
-            direction=dir,
-            part=starting_part,
-            pol=pol,
-            type=starting_part_type,
-            port=port.lower(),
-            stream=stream[dir]
-        )
-        self._recursive_connect(current)
-        port = self.sysdef.get_thru_port(port, dir, pol, starting_part_type)
+        self.part_type_cache[starting_part] = starting_part_type
+        stream[dir] = self._walk(starting_part, pol, port, dir)
+        port = self.sysdef.get_thru_port(port, dir, pol, starting_part_type)  # sysdef ports are lower case
         dir = cm_sysdef.opposite_direction[dir]
-        if isinstance(port, str):
-            plower = port.lower()
-        else:
-            plower = None
-        current = Namespace(
-            direction=dir,
-            part=starting_part,
-            pol=pol,
-            type=starting_part_type,
-            port=plower,
-            stream=stream[dir]
-        )
-        self._recursive_connect(current)
-        hu = []
-        for pn in reversed(stream['up']):
-            hu.append(pn)
-        for pn in stream['down']:
-            hu.append(pn)
-        return hu
+        stream[dir] = self._walk(starting_part, pol, port, dir)
+        return stream['up'][::-1] + stream['down']
 
-    def _recursive_connect(self, current):
+    def _walk(self, part, pol, port, direction):
         """
-        Find the next connection up the signal chain.
+        Return the connections followed out of a part/port in one direction.
+
+        The walk only depends on the arguments, so it is kept in _stream_cache and shared,
+        e.g. between the up and down followings of the same path through a part.
 
         Parameters
         ----------
-        current : Namespace object
-            Namespace containing current information.
+        part : str
+            Starting part number (uppercase)
+        pol : str
+            Polarization designation
+        port : str or None
+            Starting port (lowercase)
+        direction : str
+            Direction to follow (up or down)
 
-        """
-        conn, current = self._get_connection(current)  # rewrites current
-        if conn is None:
-            return None
-        current.stream.append(conn)
-        self._recursive_connect(current)
+        Returns
+        -------
+        list
+            Connections in order away from the starting part.  Don't modify.
 
-    def _get_connection(self, current):
         """
-        Get next connected part going the given direction.
+        key = (part, pol, port, direction)
+        stream = self._stream_cache.get(key)
+        if stream is None:
+            stream = []
+            self._follow_connections(part, pol, port, direction, stream)
+            self._stream_cache[key] = stream
+        return stream
+
+    def _follow_connections(self, part, pol, port, direction, stream):
+        """
+        Follow the connections along the signal chain until it ends.
+
+        The hop lookups are bound to locals once per walk, since they are the same
+        for every hop.
 
         Parameters
         ----------
-        current : Namespace object
-            Namespace containing current information, which gets updated.
-
-        """
-        # Get the next port we want.
-        oside = cm_sysdef.opposite_direction[current.direction]
-        if current.port is None:
-            return None, None
-        try:
-            this_conn = self.active.connections[oside][current.part][current.port]
-        except KeyError:
-            return None, None
-        # Now increment the connection up/down the chain
-        if current.direction == "up":
-            current.part = this_conn.upstream_part.upper()
-            port1 = this_conn.upstream_output_port.lower()
-        elif current.direction == "down":
-            current.part = this_conn.downstream_part.upper()
-            port1 = this_conn.downstream_input_port.lower()
-        current.type = self.active.parts[current.part].ptype
-        self.part_type_cache[current.part] = current.type
-        try:
-            options = list(self.active.connections[oside][current.part].keys())
-        except KeyError:
-            options = None
-        if options is None:
-            current.port = None
-        else:
-            next_port = self.sysdef.get_thru_port(port1, oside, current.pol, current.type)
-            if next_port in options:
-                current.port = next_port
-            else:
-                current.port = None
-        return this_conn, current
+        part : str
+            Starting part number (uppercase)
+        pol : str
+            Polarization designation
+        port : str or None
+            Starting port (lowercase)
+        direction : str
+            Direction to follow (up or down)
+        stream : list
+            The connections get appended to this list.
+
+        """
+        oside = cm_sysdef.opposite_direction[direction]
+        connection_index = self.active.connection_index
+        side_connections = self.active.connections[oside]
+        parts = self.active.parts
+        part_type_cache = self.part_type_cache
+        get_thru_port = self.sysdef.get_thru_port
+        while port is not None:
+            other_end = connection_index.get((oside, part, port))
+            if other_end is None:
+                break
+            stream.append(other_end[2])
+            # Now increment the connection up/down the chain
+            part, port1 = other_end[0], other_end[1]
+            part_type = part_type_cache.get(part)
+            if part_type is None:
+                part_type = part_type_cache[part] = parts[part].ptype
+            options = side_connections.get(part)  # port-keyed dict
+            if options is None:
+                break
+            port = get_thru_port(port1, oside, pol, part_type)
+            if port not in options:
+                break
 
     def _sort_hookup_display(self, sortby=None, def_sort_order="NP"):
         """
@@ -476,11 +551,15 @@ class HookupEntry(object):
 
     """
 
+    __slots__ = ("fully_connected", "columns", "timing", "part_type", "key", "sysdef", "_strm", "hookup",
+                 "port_order")
+
     def __init__(self, entry_key, sysdef):
         self.fully_connected = {}  # flag if fully connected
         self.columns = {}  # list with the actual column headers in hookup
         self.timing = {}  # aggregate hookup start and stop
         self.part_type = {}
+        self.port_order = {}  # display position of each hookup port
         self.key = entry_key
         self.sysdef = sysdef
         self.columns = copy(self.sysdef.hookup)  # REDEFINE LATER TO ALLOW SUBSET
@@ -498,18 +577,56 @@ class HookupEntry(object):
         Consolidate the superset of information from _strm into hookup. (Needed?)
         """
         self.hookup = {}
-        tmplisting = {}
         for this_signal_path in self._strm['up']:  # pick one direction for signal_paths to use
             self.hookup[this_signal_path] = {}
-            tmplisting[this_signal_path] = []
+            # ActiveData holds one object per connection, so identical hookups hold the same objects.
+            listing = set()
             for dir in self._strm.keys():
                 for this_port, connct in self._strm[dir][this_signal_path].items():
-                    entrystr = str(connct)
-                    if entrystr not in tmplisting[this_signal_path]:
+                    entry = tuple(id(x) for x in connct)
+                    if entry not in listing:
                         self.hookup[this_signal_path][this_port] = connct
-                        tmplisting[this_signal_path].append(entrystr)
+                        listing.add(entry)
                     elif verbose:
-                        print(f"Already found {dir} {this_signal_path} {this_port} {entrystr}")
+                        print(f"Already found {dir} {this_signal_path} {this_port} {connct}")
+
+    def sort_ports(self, orders):
+        """
+        Find the display position of the hookup ports of each signal path.
+
+        Parameters
+        ----------
+        orders : dict
+            Orders already found, keyed on the tuple of ports.  Entries of the same
+            part type have the same ports, so this is shared to sort each set once.
+
+        """
+        for this_signal_path, sp_hookup in self.hookup.items():
+            ports = tuple(sp_hookup)
+            if ports not in orders:
+                orders[ports] = {port: i for i, port in
+                                 enumerate(cm_utils.put_keys_in_order(ports, sort_order="PN"))}
+            self.port_order[this_signal_path] = orders[ports]
+
+    def ports_in_order(self, signal_path):
+        """
+        Return the hookup ports of signal_path in display order.
+
+        Ports not found by sort_ports (e.g. added since) go last, in the order they were added.
+
+        Parameters
+        ----------
+        signal_path : str
+            Signal path of the ports.
+
+        Returns
+        -------
+        list
+            Ports in display order.
+
+        """
+        order = self.port_order.get(signal_path, {})
+        return sorted(self.hookup[signal_path], key=lambda port: order.get(port, len(order)))
 
     def add_extras(self, pt_cache):
         """
@@ -522,29 +639,20 @@ class HookupEntry(object):
 
         """
         full_hookup_length = len(self.sysdef.hookup) - 1
-        latest_start = 0
-        earliest_stop = None
         for this_signal_path in self.sysdef.signal_paths:
             self.part_type[this_signal_path] = {}
             self.timing[this_signal_path] = {}
             self.fully_connected[this_signal_path] = {}
-            for this_port in self.hookup[this_signal_path]:
-                self.part_type[this_signal_path][this_port] = []
-                for c in self.hookup[this_signal_path][this_port]:
-                    self.part_type[this_signal_path][this_port].append(pt_cache[c.upstream_part])
-                    if c.start_gpstime > latest_start:
-                        latest_start = c.start_gpstime
-                    if c.stop_gpstime is None:
-                        pass
-                    elif earliest_stop is None:
-                        earliest_stop = c.stop_gpstime
-                    elif c.stop_gpstime < earliest_stop:
-                        earliest_stop = c.stop_gpstime
-                self.part_type[this_signal_path][this_port].append(pt_cache[self.hookup[this_signal_path][this_port][-1].downstream_part])  # noqa
+            for this_port, conns in self.hookup[this_signal_path].items():
+                self.part_type[this_signal_path][this_port] = [pt_cache[c.upstream_part] for c in conns]
+                self.part_type[this_signal_path][this_port].append(pt_cache[conns[-1].downstream_part])
+                latest_start = max((c.start_gpstime for c in conns), default=0)
+                stops = [c.stop_gpstime for c in conns if c.stop_gpstime is not None]
+                earliest_stop = min(stops) if stops else None
                 self.timing[this_signal_path][this_port] = [latest_start, earliest_stop]
-                self.fully_connected[this_signal_path][this_port] = len(self.hookup[this_signal_path][this_port]) == full_hookup_length  # noqa
+                self.fully_connected[this_signal_path][this_port] = len(conns) == full_hookup_length
 
-    def table_entry_row(self, pol, port, cols, show):
+    def table_entry_row(self, pol, port, cols, show, col_index=None):
         """
         Produce the hookup table row for given parameters.
 
@@ -558,6 +666,9 @@ class HookupEntry(object):
             Columns to include
         show : dict
             Dictionary containing flags of what components to show.
+        col_index : dict or None
+            Position of the first occurrence of each column in cols, as from
+            column_index(cols).  If None, it is made here.
 
         Returns
         -------
@@ -567,28 +678,31 @@ class HookupEntry(object):
         """
         timing = self.timing[pol][port]
         td = ["-"] * len(cols)
+        if col_index is None:
+            col_index = column_index(cols)
 
         # Get the first N-1 parts
         dip = ""
         for part_type, c in zip(self.part_type[pol][port], self.hookup[pol][port]):
-            if part_type in cols:
-                new_row_entry = self._build_new_row_entry(
+            idx = col_index.get(part_type)
+            if idx is not None:
+                td[idx] = self._build_new_row_entry(
                     dip, c.upstream_part, c.upstream_output_port, show
                 )
-                td[cols.index(part_type)] = new_row_entry
             dip = c.downstream_input_port + "> "
         # Get the last part in the hookup
-        part_type = self.part_type[pol][port][-1]
-        if part_type in cols:
-            new_row_entry = self._build_new_row_entry(
+        idx = col_index.get(self.part_type[pol][port][-1])
+        if idx is not None:
+            td[idx] = self._build_new_row_entry(
                 dip, c.downstream_part, None, show
             )
-            td[cols.index(part_type)] = new_row_entry
         # Add timing
-        if "start" in cols:
-            td[cols.index("start")] = timing[0]
-        if "stop" in cols:
-            td[cols.index("stop")] = timing[1]
+        idx = col_index.get("start")
+        if idx is not None:
+            td[idx] = timing[0]
+        idx = col_index.get("stop")
+        if idx is not None:
+            td[idx] = timing[1]
         return td
 
     def _build_new_row_entry(self, dip, part, port, show):
@@ -612,10 +726,8 @@ class HookupEntry(object):
             String containing that row entry.
 
         """
-        new_row_entry = ""
-        if show["ports"]:
-            new_row_entry = dip
-        new_row_entry += part
-        if port is not None and show["ports"]:
-            new_row_entry += " <" + port
-        return new_row_entry
+        if not show["ports"]:
+            return part
+        if port is None:
+            return f"{dip}{part}"
+        return f"{dip}{part} <{port}"
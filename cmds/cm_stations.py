@@ -94,7 +94,7 @@ class Stations:
             tile = self._parse_tile(station_name)
             utm_p = ccrs.UTM(tile[0])
             lat_corr = self.lat_corr[tile[1]]
-            stn = copy(self.active.stations[station_name])
+            stn = copy(this_station)
             # a.desc = self.station_types[a.station_type_name]["Description"] from Sysdef now
             stn.lon, stn.lat = latlon_p.transform_point(
                 stn.easting, stn.northing - lat_corr, utm_p
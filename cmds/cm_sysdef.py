@@ -4,12 +4,41 @@
 
 """Defines the system architecture for the telescope."""
 import json
+import sys
 
 from .cm import file_finder
 
 opposite_direction = {"up": "down", "down": "up"}
 
 
+def _normalize_ports(component):
+    """
+    Return a copy of a component with its port names lower-cased and interned.
+
+    The ports end up compared against the (lower case) connection keys during the
+    hookup walk, so this is done once here rather than on every hop.
+
+    Parameters
+    ----------
+    component : dict
+        Component entry of the sysdef, with 'up' and 'down' port lists per pol.
+
+    Returns
+    -------
+    dict
+        The component with new 'up' and 'down' dicts, the component itself is unchanged.
+
+    """
+    normalized = dict(component)
+    for side in ('up', 'down'):
+        if side in component:
+            normalized[side] = {
+                pol: [sys.intern(x.lower()) if isinstance(x, str) else x for x in ports]
+                for pol, ports in component[side].items()
+            }
+    return normalized
+
+
 class Sysdef:
     """
     Defines the system architecture for the telescope array for given architecture.  Default
@@ -57,10 +86,14 @@ class Sysdef:
             return
         with open(self.sysdef_file, 'r') as fp:
             self.sysdef_json = json.load(fp)
-        self.components = self.sysdef_json['components']
+        # Components as read (for display) and with normalized ports (for use), sysdef_json is left as is.
+        self._components_as_read = dict(self.sysdef_json['components'])
+        self.components = {
+            name: _normalize_ports(component) for name, component in self._components_as_read.items()
+        }
+        self._thru_port_cache = {}
         self.station_types = self.sysdef_json['station_types']
         self.apriori_statuses = self.sysdef_json['apriori_statuses']
-        
 
     def get_hookup(self, hookup_type):
         """
@@ -89,9 +122,11 @@ class Sysdef:
             if isinstance(hd, dict):  # Reconfigure the base component
                 self.hookup.append(list(hd.keys())[0])
                 for dir, dat in hd.items():
-                    self.components[dir].update(dat)
+                    self._components_as_read[dir] = {**self._components_as_read[dir], **dat}
+                    self.components[dir] = _normalize_ports(self._components_as_read[dir])
             else:
                 self.hookup.append(hd)
+        self._thru_port_cache = {}  # the components may have been reconfigured
 
     def print_sysdef(self):
         ports = ['', '']
@@ -103,7 +138,7 @@ class Sysdef:
                 cmp = [self.hookup[i], self.hookup[i+1]]
                 sp = [['', ''], ['', '']]
                 for j in range(2):
-                    ports[j] = ','.join([str(x) for x in self.sysdef_json['components'][cmp[j]][dir[j]][pol]])
+                    ports[j] = ','.join([str(x) for x in self._components_as_read[cmp[j]][dir[j]][pol]])
                     if ',' in ports[j]:
                         sp[j] = ['(', ')']
                 print(f"{(i+1) * '  '}{cmp[0]}  < {sp[0][0]}{ports[0]}{sp[0][1]} | {sp[1][0]}{ports[1]}{sp[1][1]} >  {cmp[1]}")
@@ -132,6 +167,18 @@ class Sysdef:
         """
         if port is None:
             return None
+        key = (port, side, pol, part_type)
+        try:
+            return self._thru_port_cache[key]
+        except KeyError:
+            pass
+        thru_port = self._find_thru_port(port, side, pol, part_type)
+        if thru_port is not None:  # a miss is looked for again (and warned about) each time
+            self._thru_port_cache[key] = thru_port
+        return thru_port
+
+    def _find_thru_port(self, port, side, pol, part_type):
+        """Find the port on the other side from the components (see get_thru_port)."""
         otherside = opposite_direction[side]
         other_side_ports = self.components[part_type][otherside][pol]
         # If only 1
@@ -161,14 +208,23 @@ class Sysdef:
             tmp.setdefault(len(pp), [])
             tmp[len(pp)].append(pp)
         self.part_type_order = []
-        for lpp in sorted(tmp, reverse=True):
+        self.part_prefix_lengths = sorted(tmp, reverse=True)
+        self._part_type_cache = {}
+        for lpp in self.part_prefix_lengths:
             for pp in tmp[lpp]:
                 self.part_type_order.append(pp)
 
     def get_part_type(self, prefix):
-        for ppre in self.part_type_order:
-            if prefix.startswith(ppre):
-                return self.part_types[ppre]
+        try:
+            return self._part_type_cache[prefix]
+        except KeyError:
+            pass
+        # Longest matching prefix wins, so check the leading slice for each length in turn.
+        for lpp in self.part_prefix_lengths:
+            ptype = self.part_types.get(prefix[:lpp])
+            if ptype is not None:
+                self._part_type_cache[prefix] = ptype
+                return ptype
         raise ValueError(f"{prefix} not found in part types")
 
     def make_part_number(self, val, part_type):
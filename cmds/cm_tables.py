@@ -5,9 +5,8 @@
 """All of the tables defined here."""
 
 from astropy.time import Time
-from sqlalchemy import BigInteger, Column, ForeignKeyConstraint, String, Text, Float, func
+from sqlalchemy import BigInteger, Column, ForeignKeyConstraint, String, Text, Float, bindparam, select
 from . import CMDeclarativeBase, NotNull, cm
-import copy
 
 
 def get_sstimes(cls):
@@ -26,6 +25,13 @@ def get_sstimes(cls):
     return f"[{start} - {stop}]"
 
 
+def in_chunks(keys, chunk_size=500):
+    """Yield the keys as lists of at most chunk_size, to keep each IN (...) query bounded."""
+    keys = list(keys)
+    for i in range(0, len(keys), chunk_size):
+        yield keys[i:i + chunk_size]
+
+
 def get_cptimes(cls, corp):
     """Return formatted created/posted."""
     cps = f"{corp}_date"
@@ -124,15 +130,19 @@ def update_stations(stations, dates, session=None):
 
     updated = 0
     with cm.CMSessionWrapper(session) as session:
+        sns = {statd['station_name'].upper() for statd in stations}
+        present = set()
+        for these in in_chunks(sns):
+            present.update(row.station_name for row in
+                           session.query(Stations.station_name).filter(Stations.station_name.in_(these)))
         for statd, date in zip(stations, dates):
             sn = statd['station_name'].upper()
-            statx = session.query(Stations).filter(
-                func.upper(Stations.station_name) == sn).first()
-            if statx is None:
+            if sn not in present:
                 station = Stations()
                 updated += station.station(created_gpstime=date.gps, **statd)
                 print(f"Add {station}")
                 session.add(station)
+                present.add(sn)
             else:
                 print(f"{sn} already present.  No action.")
     return updated
@@ -224,9 +234,13 @@ def update_parts(parts, dates, session=None):
     """
     updated = 0
     with cm.CMSessionWrapper(session) as session:
+        pns = {partd['pn'].upper() for partd in parts}
+        existing = {}
+        for these in in_chunks(pns):
+            existing.update((part.pn, part) for part in session.query(Parts).filter(Parts.pn.in_(these)))
         for partd, date in zip(parts, dates):
             pn = partd['pn'].upper()
-            part = session.query(Parts).filter(func.upper(Parts.pn) == pn).first()
+            part = existing.get(pn)
             if partd['action'].lower() == 'stop':
                 this_update = None
                 if part is None:
@@ -240,6 +254,7 @@ def update_parts(parts, dates, session=None):
                                'start_gpstime': date.gps, 'stop_gpstime': None}
                 if part is None:
                     part = Parts()
+                    existing[pn] = part
                 else:
                     print(f"{pn} already in database.  No update.")
                     this_update = None
@@ -306,6 +321,12 @@ class PartInfo(CMDeclarativeBase):
         return updated
 
 
+# Existence check run once per input row in update_info (a Core select, no ORM instances).
+_info_posted_stmt = select(PartInfo.pn).where(
+    (PartInfo.pn == bindparam('pn'))
+    & (PartInfo.posting_gpstime == bindparam('posting_gpstime'))).limit(1)
+
+
 def update_info(infos, dates, session):
     """
     Add part information into database.
@@ -328,9 +349,7 @@ def update_info(infos, dates, session):
     with cm.CMSessionWrapper(session) as session:
         for infod, date in zip(infos, dates):
             pn = infod['pn'].upper()
-            infox = session.query(PartInfo).filter((func.upper(PartInfo.pn) == pn)
-                                                   & (PartInfo.posting_gpstime
-                                                      == date.gps)).first()
+            infox = session.execute(_info_posted_stmt, {'pn': pn, 'posting_gpstime': date.gps}).scalar()
             if infox is None:
                 info = PartInfo()
                 updated += info.info(posting_gpstime=date.gps, **infod)
@@ -471,6 +490,24 @@ def get_connection(conn):
     return this_conn
 
 
+_connection_key_fields = ('upstream_part', 'upstream_output_port',
+                          'downstream_part', 'downstream_input_port')
+# Lookups run once per input row in update_connections, built once here with bound parameters.
+# Parts/ports are stored normalized (see Connections.connection) so the columns are compared directly.
+_same_connection_key = (
+    (Connections.upstream_part == bindparam('upstream_part'))
+    & (Connections.upstream_output_port == bindparam('upstream_output_port'))
+    & (Connections.downstream_part == bindparam('downstream_part'))
+    & (Connections.downstream_input_port == bindparam('downstream_input_port'))
+)
+_open_connections_stmt = select(Connections).where(
+    _same_connection_key & Connections.stop_gpstime.is_(None)).limit(2)
+_nearby_connection_stmt = select(Connections).where(
+    _same_connection_key
+    & (Connections.start_gpstime > bindparam('after'))
+    & (Connections.start_gpstime < bindparam('before'))).limit(1)
+
+
 def update_connections(conns, dates, same_conn_sec=10, session=None):
     """
     Add or stop connections.
@@ -495,42 +532,38 @@ def update_connections(conns, dates, same_conn_sec=10, session=None):
     updated = 0
     with cm.CMSessionWrapper(session) as session:
         for connd, date in zip(conns, dates):
-            connections_to_check = session.query(Connections).filter(
-                (func.upper(Connections.upstream_part) == connd['upstream_part'].upper())
-                & (func.lower(Connections.upstream_output_port)
-                   == connd['upstream_output_port'].lower())
-                & (func.upper(Connections.downstream_part) == connd['downstream_part'].upper())
-                & (func.lower(Connections.downstream_input_port)
-                   == connd['downstream_input_port'].lower())
-            )
+            missing = [field for field in _connection_key_fields if not connd.get(field)]
+            if len(missing):
+                print(f"{connd} has no {', '.join(missing)}.  No action.")
+                continue
+            key = {'upstream_part': connd['upstream_part'].upper(),
+                   'upstream_output_port': connd['upstream_output_port'].lower(),
+                   'downstream_part': connd['downstream_part'].upper(),
+                   'downstream_input_port': connd['downstream_input_port'].lower()}
             if connd['action'].lower() == 'stop':
                 this_update = None
-                if connections_to_check.count() == 0:
-                    print(f"No connection in database {connd}.")
+                open_connections = session.execute(_open_connections_stmt, key).scalars().all()
+                if len(open_connections) == 0:
+                    print(f"No open connection in database {connd}.")
+                elif len(open_connections) > 1:
+                    print(f"Multiple open connections for {open_connections[0]}. No action.")
                 else:
-                    for connx in connections_to_check:
-                        if connx.stop_gpstime is None:
-                            if this_update is None:
-                                this_update = {'stop_gpstime', date.gps}
-                                connection = copy(connx)
-                            else:
-                                print(f"Multiple open connections for {connx}. No action.")
-                                this_update = None
-                                break
+                    this_update = {'stop_gpstime': date.gps}
+                    connection = open_connections[0]
             elif connd['action'].lower() == 'add':
                 this_update = {"upstream_part": connd['upstream_part'],
                                "upstream_output_port": connd['upstream_output_port'],
                                "downstream_part": connd['downstream_part'],
                                "downstream_input_port": connd['downstream_input_port'],
                                "start_gpstime": date.gps, "stop_gpstime": None}
-                if connections_to_check.count() == 0:
-                    connection = Connections()
-                else:
-                    for connection in connections_to_check:
-                        if abs(connection.start_gpstime - date.gps) < same_conn_sec:
-                            print(f"{connection} is already present.  No action.")  # noqa
-                            this_update = None
-                    connection = Connections()
+                same_connection = session.execute(
+                    _nearby_connection_stmt,
+                    dict(key, after=date.gps - same_conn_sec, before=date.gps + same_conn_sec)
+                ).scalars().first()
+                if same_connection is not None:
+                    print(f"{same_connection} is already present.  No action.")  # noqa
+                    this_update = None
+                connection = Connections()
             if this_update is not None:
                 updated += connection.connection(**this_update)
                 print(f"{connd['action']} {connection}")
@@ -634,8 +667,8 @@ def update_aprioris(aprioris, session=None):
         got_valid = False
         for apriorid in aprioris:
             pn = apriorid['pn'].upper()
-            aprioric = session.query(AprioriStatus).filter(func.upper(AprioriStatus.pn) == pn,
-                                                           AprioriStatus.stop_gpstime is None)
+            aprioric = session.query(AprioriStatus).filter(AprioriStatus.pn == pn,
+                                                           AprioriStatus.stop_gpstime.is_(None))
             add_entry = True
             if aprioric.count() == 1:  # If status is different, stop current and make new.
                 apx = aprioric.first()
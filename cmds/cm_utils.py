@@ -7,6 +7,7 @@
 from astropy.time import Time
 from astropy.time import TimeDelta
 import datetime
+from functools import lru_cache
 
 
 PAST_DATE = "2000-01-01"
@@ -39,8 +40,9 @@ def get_pn_list(pnreq, pnlist, exact_match):
     ----------
     pnreq : str, list
         Requested part number(s)
-    pnlist : list
-        Contains possible list of pns
+    pnlist : list, set or dict
+        Contains possible pns.  If a set or dict (e.g. ActiveData.parts) it is used directly
+        for exact matches, so its entries are assumed to already be uppercase.
     exact_match : bool
         Flag to enforce exact match, or starting
 
@@ -53,13 +55,16 @@ def get_pn_list(pnreq, pnlist, exact_match):
     if isinstance(pnreq, str):
         pnreq = listify(pnreq)
     pnreq = to_upper(pnreq)
-    pnlist = to_upper(pnlist)
     pnfnd = []
-    for pn in pnreq:
-        if exact_match:
+    if exact_match:
+        if not isinstance(pnlist, (dict, set, frozenset)):
+            pnlist = set(to_upper(list(pnlist)))
+        for pn in pnreq:
             if pn in pnlist:
                 pnfnd.append(pn)
-        else:
+    else:
+        pnlist = to_upper(list(pnlist))
+        for pn in pnreq:
             for pntrial in pnlist:
                 if pntrial.startswith(pn):
                     pnfnd.append(pntrial)
@@ -444,6 +449,7 @@ def get_astropytime(adate, atime=None, float_format=None):
             return return_date + TimeDelta(add_time, format="sec")
 
 
+@lru_cache(maxsize=4096)
 def peel_key(key, sort_order):
     """
     Separate a hookup key into its parts.
@@ -494,14 +500,8 @@ def put_keys_in_order(keys, sort_order="NP"):
         Ordered list of keys
 
     """
-    keylib = {}
-    for k in keys:
-        keylib[peel_key(k, sort_order)] = k
-
-    keyordered = []
-    for k in sorted(keylib.keys()):
-        keyordered.append(keylib[k])
-    return keyordered
+    keylib = {peel_key(k, sort_order): k for k in keys}
+    return [keylib[k] for k in sorted(keylib)]
 
 
 def html_table(headers, table):
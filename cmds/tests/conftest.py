@@ -0,0 +1,32 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Shared fixtures for the cmds tests."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from cmds import CMDeclarativeBase, cm_tables
+
+
+@pytest.fixture
+def session():
+    """Return a session on an in-memory sqlite database with all of the cm tables."""
+    engine = create_engine("sqlite://")
+    CMDeclarativeBase.metadata.create_all(engine)
+    with Session(engine) as this_session:
+        yield this_session
+
+
+@pytest.fixture
+def connection():
+    """Return a factory for cm_tables.Connections rows."""
+    def make_connection(upstream_part, upstream_output_port, downstream_part, downstream_input_port,
+                        start_gpstime=1, stop_gpstime=None):
+        return cm_tables.Connections(upstream_part=upstream_part, upstream_output_port=upstream_output_port,
+                                     downstream_part=downstream_part,
+                                     downstream_input_port=downstream_input_port,
+                                     start_gpstime=start_gpstime, stop_gpstime=stop_gpstime)
+    return make_connection
@@ -0,0 +1,61 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.cm_dossier`."""
+
+import pytest
+
+from cmds import cm_active, cm_dossier, cm_tables
+
+COLUMNS = ["up.upstream_part", "up.downstream_input_port", "pn",
+           "down.upstream_output_port", "down.downstream_part"]
+
+
+@pytest.fixture
+def entry(session, connection):
+    """Return a DossierEntry with inputs e and n and output out."""
+    for pn in ["A1", "F1", "S1"]:
+        session.add(cm_tables.Parts(pn=pn, ptype="antenna", manufacturer_id="1", start_gpstime=1))
+    session.add_all([connection("S1", "e", "A1", "e"), connection("S1", "n", "A1", "n"),
+                     connection("A1", "out", "F1", "x")])
+    session.flush()
+    active = cm_active.ActiveData(session, at_date=1300000000, float_format="gps")
+    active.load_parts()
+    active.load_connections()
+    this_entry = cm_dossier.DossierEntry("A1")
+    this_entry.get_entry(active)
+    return this_entry
+
+
+def test_no_port_filter(entry):
+    """Show every row when no ports are given."""
+    assert entry.table_row(COLUMNS) == [
+        ["S1", "e", "A1", "out", "F1"],
+        ["S1", "n", "A1", None, None],
+    ]
+
+
+def test_port_filter_keeps_all_rows(entry):
+    """Filtering out the down connection of the first row must not drop the second row."""
+    assert entry.table_row(COLUMNS, ports=["E", "n"]) == [
+        ["S1", "e", "A1", None, None],
+        ["S1", "n", "A1", None, None],
+    ]
+
+
+def test_port_filter_keeps_up_side(entry):
+    """Keep the up connection of a row whose down connection is filtered out."""
+    assert entry.table_row(COLUMNS, ports=["E"]) == [["S1", "e", "A1", None, None]]
+
+
+def test_port_filter_keeps_down_side(entry):
+    """Keep the down connection of a row whose up connection is filtered out."""
+    assert entry.table_row(COLUMNS, ports=frozenset(["out"])) == [
+        [None, None, "A1", "out", "F1"],
+    ]
+
+
+def test_port_filter_no_match(entry):
+    """Show no rows when no port matches."""
+    assert entry.table_row(COLUMNS, ports=["z"]) == []
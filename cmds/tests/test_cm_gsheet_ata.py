@@ -0,0 +1,254 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.cm_gsheet_ata`."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from cmds import cm_gsheet_ata
+
+TUNING_HEADER = ['$Pol:Tuning', '$Antenna', '$RFSoC', '$SNAP']
+ANTENNA_CSV = b'$Antenna,$A Priori Status,$Comments\n1a,ok,\n'
+TUNING_CSV = b'$Pol:Tuning,$Antenna,$RFSoC,$SNAP\n1:xa,1a,2:0,3:a0\n#Obs\n'
+
+
+class FakeResponse:
+    """Stand-in for requests.Response."""
+
+    def __init__(self, status_code=200, content=b'', headers=None, json_data=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.json_data = json_data
+
+    def raise_for_status(self):
+        """Raise for an error status, as requests does."""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        """Return the json body."""
+        return self.json_data
+
+
+class FakeSession:
+    """Stand-in for requests.Session, answering from a dict keyed on url."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        """Return the response for url, recording the request."""
+        self.calls.append((url, headers, params))
+        return self.responses[url]
+
+
+@pytest.fixture
+def fake_session(monkeypatch, tmp_path):
+    """Return a function installing a FakeSession with the given responses, keyed on tab."""
+    monkeypatch.setenv('CMDS_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cm_gsheet_ata, '_url_cache', {})
+    monkeypatch.delenv('CMDS_GSHEET_ID', raising=False)
+
+    def install(responses):
+        session = FakeSession({cm_gsheet_ata.gsheet_url.get(key, key): val
+                               for key, val in responses.items()})
+        monkeypatch.setattr(cm_gsheet_ata, '_get_session', lambda: session)
+        return session
+    return install
+
+
+def _parse_tuning(rows):
+    sheet = cm_gsheet_ata.SheetData()
+    check_part_port = {'rfcb': set(), 'rfsoc': set(), 'snap': set()}
+    sheet._parse_tab('Tuning', [TUNING_HEADER] + rows, check_part_port)
+    return sheet, check_part_port
+
+
+def test_tuning_unique_part_ports():
+    """Record each rfcb, rfsoc and snap part:port of the Tuning tab."""
+    sheet, check_part_port = _parse_tuning([['1:xa', '1a', '2:0', '3:a0'],
+                                            ['1:ya', '1a', '2:1', '3:a1']])
+    assert check_part_port['rfcb'] == {'1:xa', '1:ya'}
+    assert check_part_port['rfsoc'] == {'2:0', '2:1'}
+    assert check_part_port['snap'] == {'3:a0', '3:a1'}
+    assert len(sheet.rfcbs[1]) == 2
+    assert sheet.header['Tuning'] == ['Pol:Tuning', 'Antenna', 'RFSoC', 'SNAP']
+
+
+@pytest.mark.parametrize(
+    'rows',
+    [
+        [['1:xa', '1a', '2:0', '3:a0'], ['1:xa', '2a', '2:1', '3:a1']],  # rfcb
+        [['1:xa', '1a', '2:0', '3:a0'], ['1:ya', '1a', '2:0', '3:a1']],  # rfsoc
+        [['1:xa', '1a', '2:0', '3:a0'], ['1:ya', '1a', '2:1', '3:A0']],  # snap
+    ],
+)
+def test_tuning_duplicate_part_port(rows):
+    """Warn on a repeated rfcb, rfsoc or snap part:port (snap ports in any case), keeping both rows."""
+    with pytest.warns(UserWarning, match='already present'):
+        sheet, _ = _parse_tuning(rows)
+    assert sum(len(x) for x in sheet.rfcbs.values()) == 2
+
+
+def test_obs_rows_skip_duplicate_check():
+    """Add the rows after #Obs to obs without checking them for duplicates."""
+    sheet, check_part_port = _parse_tuning([['1:xa', '1a', '2:0', '3:a0'],
+                                            ['#Obs'],
+                                            ['1:xa', '', '2:0', '3:a0']])
+    assert check_part_port['rfcb'] == {'1:xa'}
+    assert {'1:xa', '2:0', '3:a0'} <= sheet.obs
+
+
+def test_load_sheet(fake_session):
+    """Read all tabs through the session."""
+    fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV),
+                  'Tuning': FakeResponse(content=TUNING_CSV)})
+    sheet = cm_gsheet_ata.SheetData()
+    sheet.load_sheet()
+    assert list(sheet.ants) == ['1A']
+    assert list(sheet.rfcbs) == [1]
+
+
+def test_load_sheet_failed_tab(fake_session):
+    """Raise, rather than leave the tables empty, if a tab can't be read."""
+    fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV),
+                  'Tuning': FakeResponse(status_code=500)})
+    with pytest.raises(OSError, match='Tuning'):
+        cm_gsheet_ata.SheetData().load_sheet()
+
+
+def test_load_sheet_write_finishes_on_parse_error(fake_session, monkeypatch, tmp_path):
+    """Finish writing the csv files before a parse error is raised."""
+    def slow_write_csv(filename, csv_text):
+        time.sleep(0.2)
+        write_csv(filename, csv_text)
+    write_csv = cm_gsheet_ata.write_csv
+    monkeypatch.setattr(cm_gsheet_ata, 'write_csv', slow_write_csv)
+    fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV + b'1a,ok,\n'),
+                  'Tuning': FakeResponse(content=TUNING_CSV)})
+    with pytest.raises(ValueError, match='1A'):
+        cm_gsheet_ata.SheetData().load_sheet(arc_csv='w', path=str(tmp_path), time_tag='')
+    assert (tmp_path / 'Antenna.csv').read_text().count('1a') == 2
+    assert (tmp_path / 'Tuning.csv').exists()
+
+
+def test_response_cache(fake_session, tmp_path):
+    """Revalidate cached tabs with their ETag and use the cached body on a 304."""
+    session = fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV, headers={'ETag': '"a1"'}),
+                            'Tuning': FakeResponse(content=TUNING_CSV)})
+    cm_gsheet_ata.SheetData().load_sheet()
+    assert len(list(tmp_path.iterdir())) == 1  # Tuning had no validator
+    antenna_url = cm_gsheet_ata.gsheet_url['Antenna']
+    session.responses[antenna_url] = FakeResponse(status_code=304)
+    session.calls = []
+    sheet = cm_gsheet_ata.SheetData()
+    sheet.load_sheet()
+    assert (antenna_url, {'If-None-Match': '"a1"'}, None) in session.calls
+    assert list(sheet.ants) == ['1A']
+
+
+@pytest.mark.parametrize('cache_dir', ['', 'not_a_dir/cmds'])
+def test_response_cache_off_or_unwritable(fake_session, monkeypatch, tmp_path, cache_dir):
+    """Load normally if caching is off or the cache directory can't be written."""
+    if cache_dir:
+        (tmp_path / 'not_a_dir').write_text('')
+        cache_dir = str(tmp_path / cache_dir)
+    monkeypatch.setenv('CMDS_CACHE_DIR', cache_dir)
+    fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV, headers={'ETag': '"a1"'}),
+                  'Tuning': FakeResponse(content=TUNING_CSV)})
+    sheet = cm_gsheet_ata.SheetData()
+    sheet.load_sheet()
+    assert list(sheet.ants) == ['1A']
+    assert cm_gsheet_ata.read_response_cache(cm_gsheet_ata.gsheet_url['Antenna'], cache_dir) is None
+    assert [x.name for x in tmp_path.iterdir()] == (['not_a_dir'] if cache_dir else [])
+
+
+def test_response_cache_opt_in(fake_session, monkeypatch, tmp_path):
+    """Only cache responses if CMDS_CACHE_DIR is set or max_age > 0."""
+    monkeypatch.delenv('CMDS_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV, headers={'ETag': '"a1"'}),
+                  'Tuning': FakeResponse(content=TUNING_CSV)})
+    cm_gsheet_ata.SheetData().load_sheet()
+    assert list(tmp_path.iterdir()) == []
+    cm_gsheet_ata.SheetData.invalidate_cache()
+    cm_gsheet_ata.SheetData().load_sheet(max_age=60)
+    assert len(list((tmp_path / 'cmds').iterdir())) == 1
+
+
+@pytest.fixture
+def batch_url(monkeypatch, fake_session):
+    """Turn on the Sheets API batchGet and return its url."""
+    monkeypatch.setenv('CMDS_GSHEET_ID', 'sheet-id')
+    monkeypatch.setenv('CMDS_GSHEET_API_KEY', 'api-key')
+    return cm_gsheet_ata.gsheet_batch_url.format('sheet-id')
+
+
+def test_batch_get(fake_session, batch_url):
+    """Read all tabs with one batchGet, padding short rows to the tab width."""
+    value_ranges = [{'values': [['$Antenna', '$A Priori Status', '$Comments'], ['1a', 'ok']]},
+                    {'values': [['$Pol:Tuning', '$Antenna', '$RFSoC', '$SNAP'],
+                                ['1:xa', '1a', '2:0', '3:a0'], ['#Obs']]}]
+    session = fake_session({batch_url: FakeResponse(json_data={'valueRanges': value_ranges})})
+    sheet = cm_gsheet_ata.SheetData()
+    sheet.load_sheet()
+    assert session.calls == [(batch_url, None, [('ranges', 'Antenna'), ('ranges', 'Tuning'),
+                                                ('key', 'api-key')])]
+    assert sheet.ants['1A'] == ['1a', 'ok', '']
+    assert list(sheet.snaps) == [3]
+
+
+def test_batch_get_not_with_max_age(fake_session, batch_url):
+    """Use the csv export of each tab, which can be memoized, if max_age is set."""
+    session = fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV),
+                            'Tuning': FakeResponse(content=TUNING_CSV)})
+    cm_gsheet_ata.SheetData().load_sheet(max_age=60)
+    assert batch_url not in [call[0] for call in session.calls]
+    assert len(session.calls) == 2
+
+
+@pytest.mark.parametrize('batch_response', [FakeResponse(status_code=403),
+                                            FakeResponse(json_data={'valueRanges': []})])
+def test_batch_get_fallback(fake_session, batch_url, batch_response):
+    """Fall back to the csv export of each tab if the batchGet fails."""
+    session = fake_session({batch_url: batch_response,
+                            'Antenna': FakeResponse(content=ANTENNA_CSV),
+                            'Tuning': FakeResponse(content=TUNING_CSV)})
+    sheet = cm_gsheet_ata.SheetData()
+    sheet.load_sheet()
+    assert len(session.calls) == 3
+    assert list(sheet.ants) == ['1A']
+    assert list(sheet.rfcbs) == [1]
+
+
+def test_memo_is_opt_in(fake_session):
+    """Ask the server on every load unless max_age allows reusing this process's fetch."""
+    session = fake_session({'Antenna': FakeResponse(content=ANTENNA_CSV),
+                            'Tuning': FakeResponse(content=TUNING_CSV)})
+    cm_gsheet_ata.SheetData().load_sheet()
+    cm_gsheet_ata.SheetData().load_sheet()
+    assert len(session.calls) == 4
+    cm_gsheet_ata.SheetData().load_sheet(max_age=60)
+    assert len(session.calls) == 4
+    cm_gsheet_ata.SheetData.invalidate_cache()
+    cm_gsheet_ata.SheetData().load_sheet(max_age=60)
+    assert len(session.calls) == 6
+
+
+def test_shared_session():
+    """Share one session between threads, made when first asked for and remade after closing."""
+    cm_gsheet_ata.close_session()
+    session = cm_gsheet_ata._get_session()
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        assert ex.submit(cm_gsheet_ata._get_session).result() is session
+    assert session.get_adapter('https://').poolmanager.connection_pool_kw['maxsize'] == 16
+    cm_gsheet_ata.close_session()
+    assert cm_gsheet_ata._get_session() is not session
+    cm_gsheet_ata.close_session()
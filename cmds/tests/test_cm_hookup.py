@@ -0,0 +1,79 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.cm_hookup`."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from cmds import cm_active, cm_hookup, cm_tables
+
+
+@pytest.fixture
+def hookup_entry(connection):
+    """Return a HookupEntry with a fully connected port p1 and a partial port p2."""
+    sysdef = SimpleNamespace(hookup=["A", "B", "C"], signal_paths=["e"])
+    entry = cm_hookup.HookupEntry("A1:A", sysdef)
+    entry.hookup = {
+        "e": {
+            "p1": [connection("A1", "out", "B1", "in", 10), connection("B1", "out", "C1", "in", 20, 50)],
+            "p2": [connection("A1", "out", "B2", "in", 5)],
+        }
+    }
+    entry.add_extras({"A1": "A", "B1": "B", "B2": "B", "C1": "C"})
+    return entry
+
+
+def test_add_extras(hookup_entry):
+    """Compute the part types, timing and fully_connected flag of each port."""
+    entry = hookup_entry
+    assert entry.part_type == {"e": {"p1": ["A", "B", "C"], "p2": ["A", "B"]}}
+    # The timing of each port only comes from its own connections.
+    assert entry.timing == {"e": {"p1": [20, 50], "p2": [5, None]}}
+    assert entry.fully_connected == {"e": {"p1": True, "p2": False}}
+
+
+def test_ports_in_order(hookup_entry, connection):
+    """Show the ports in sorted order, with any port not sorted last."""
+    entry = hookup_entry
+    entry.hookup["e"] = {"p2": entry.hookup["e"]["p2"], "p1": entry.hookup["e"]["p1"]}
+    assert entry.ports_in_order("e") == ["p2", "p1"]  # Not sorted yet
+    entry.sort_ports({})
+    assert entry.ports_in_order("e") == ["p1", "p2"]
+    entry.hookup["e"]["p0"] = [connection("A1", "out", "B3", "in")]
+    assert entry.ports_in_order("e") == ["p1", "p2", "p0"]
+
+
+def test_get_notes(session, hookup_entry):
+    """Collect the notes of the parts in all or only the fully connected hookups."""
+    session.add_all([cm_tables.PartInfo(pn="B2", posting_gpstime=1, comment="a\\nb", reference="r"),
+                     cm_tables.PartInfo(pn="C1", posting_gpstime=2, comment="c"),
+                     cm_tables.PartInfo(pn="Z1", posting_gpstime=3, comment="z")])
+    session.flush()
+    hookup = cm_hookup.Hookup(session=session)
+    hookup.hookup = {"A1:A": hookup_entry}
+    hookup.active = cm_active.ActiveData(session, at_date=1300000000, float_format="gps")
+    hookup.active.load_info()
+    hookup.get_notes()
+    assert hookup.notes == {"A1:A": {"B2": {1: "a\nb"}, "C1": {2: "c"}}}
+    # Only p1 is fully connected.
+    hookup.get_notes(state="full", return_dict=True)
+    assert hookup.notes == {"A1:A": {"C1": {2: {"note": "c", "ref": None}}}}
+
+
+def test_get_hookup_port_less_part(session, connection):
+    """Keep parts without ports, even if their type doesn't have the hookup's signal paths (or isn't in sysdef)."""
+    session.add_all([cm_tables.Parts(pn="A1", ptype="antenna", manufacturer_id="1", start_gpstime=1),
+                     cm_tables.Parts(pn="F1", ptype="feed", manufacturer_id="1", start_gpstime=1),
+                     cm_tables.Parts(pn="CB1", ptype="control-box", manufacturer_id="1", start_gpstime=1),
+                     cm_tables.Parts(pn="X1", ptype="not-in-sysdef", manufacturer_id="1", start_gpstime=1),
+                     connection("A1", "focus", "F1", "input")])
+    session.flush()
+    hookup = cm_hookup.Hookup(session=session)
+    active = cm_active.ActiveData(session, at_date=1300000000, float_format="gps")
+    hookup.get_hookup(["A1", "CB1", "X1"], at_date=1300000000, float_format="gps", exact_match=True, active=active)
+    assert set(hookup.hookup) == {"A1", "CB1", "X1"}
+    assert list(hookup.hookup["A1"].hookup["x"]) == ["focus"]
+    assert hookup.hookup["CB1"].hookup == hookup.hookup["X1"].hookup == {"x": {}, "y": {}}
@@ -0,0 +1,19 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.cm_sysdef`."""
+
+from cmds import cm_sysdef
+
+
+def test_get_thru_port_does_not_cache_none(capsys):
+    """Look for a thru port again if it wasn't found, but reuse one that was."""
+    sysdef = cm_sysdef.Sysdef()
+    sysdef.components["X"] = {"up": {"e": ["a"]}, "down": {"e": ["xa", "xb"]}}
+    assert sysdef.get_thru_port("q", "up", "e", "X") is None
+    assert "criteria not met" in capsys.readouterr().out
+    sysdef.components["X"]["down"]["e"].append("ea")
+    assert sysdef.get_thru_port("q", "up", "e", "X") == "ea"
+    sysdef.components["X"]["down"]["e"] = ["eb"]
+    assert sysdef.get_thru_port("q", "up", "e", "X") == "ea"
@@ -0,0 +1,75 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.cm_tables`."""
+
+import pytest
+from astropy.time import Time
+
+from cmds import cm_tables
+
+
+@pytest.fixture
+def connd():
+    """Return a factory for the update_connections dict of one connection and action."""
+    def make_connd(action):
+        return {"upstream_part": "a1", "upstream_output_port": "E", "downstream_part": "f1",
+                "downstream_input_port": "EA", "action": action}
+    return make_connd
+
+
+def _connections(session):
+    return session.query(cm_tables.Connections).order_by(cm_tables.Connections.start_gpstime).all()
+
+
+def test_update_connections_add_stop(session, connd):
+    """Add a connection once and stop the open one."""
+    add, stop = Time(1300000000, format="gps"), Time(1300001000, format="gps")
+    assert cm_tables.update_connections([connd("add")], [add], session=session) == 6
+    assert cm_tables.update_connections([connd("add")], [add], session=session) == 0
+    assert cm_tables.update_connections([connd("stop")], [stop], session=session) == 1
+    conn = _connections(session)[0]
+    assert (conn.upstream_part, conn.upstream_output_port) == ("A1", "e")
+    assert (conn.start_gpstime, conn.stop_gpstime) == (1300000000, 1300001000)
+    # Nothing is left open to stop.
+    assert cm_tables.update_connections([connd("stop")], [stop], session=session) == 0
+
+
+def test_update_connections_stop_multiple_open(session, connd, capsys):
+    """Stop nothing if more than one matching connection is open."""
+    dates = [Time(1300000000, format="gps"), Time(1300001000, format="gps")]
+    assert cm_tables.update_connections([connd("add"), connd("add")], dates, session=session) == 12
+    assert cm_tables.update_connections(
+        [connd("stop")], [Time(1300002000, format="gps")], session=session) == 0
+    assert "Multiple open connections" in capsys.readouterr().out
+    assert [c.stop_gpstime for c in _connections(session)] == [None, None]
+
+
+def test_update_aprioris_new_status(session):
+    """Stop the open status and add the new one when the status changes."""
+    session.add(cm_tables.AprioriStatus(pn="A1", start_gpstime=1200000000, stop_gpstime=None,
+                                        status="active", comment=""))
+    change = {"pn": "a1", "status": "maintenance", "comment": "", "date": Time(1300000000, format="gps")}
+    assert cm_tables.update_aprioris([change], session=session) == 6
+    aprioris = session.query(cm_tables.AprioriStatus).order_by(cm_tables.AprioriStatus.start_gpstime).all()
+    assert [(x.status, x.start_gpstime, x.stop_gpstime) for x in aprioris] == [
+        ("active", 1200000000, 1300000000), ("maintenance", 1300000000, None)]
+    # The same status again changes nothing.
+    assert cm_tables.update_aprioris([change], session=session) == 0
+
+
+def test_in_chunks():
+    """Split the keys into lists of at most chunk_size."""
+    assert list(cm_tables.in_chunks(range(5), chunk_size=2)) == [[0, 1], [2, 3], [4]]
+    assert list(cm_tables.in_chunks(set())) == []
+
+
+def test_update_stations_many(session):
+    """Find existing stations across more than one IN (...) query."""
+    stations = [{"station_name": f"s{i}", "station_type": "ant", "northing": 0.0, "easting": 0.0,
+                 "elevation": 0.0} for i in range(1200)]
+    dates = [Time(1300000000, format="gps")] * len(stations)
+    assert cm_tables.update_stations(stations[:700], dates[:700], session=session) > 0
+    cm_tables.update_stations(stations, dates, session=session)
+    assert session.query(cm_tables.Stations).count() == 1200
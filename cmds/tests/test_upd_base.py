@@ -0,0 +1,40 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+"""Testing for `cmds.upd_base`."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from cmds import cm_gsheet_ata, upd_base
+
+
+@pytest.fixture
+def update(monkeypatch, session):
+    """Return an Update printing to screen on the sqlite session."""
+    monkeypatch.setattr(upd_base.cm, 'connect_to_cm_db', lambda args: SimpleNamespace(sessionmaker=lambda: session))
+    return upd_base.Update(script_type=None, verbose=False)
+
+
+def test_load_gsheet_passes_tabs_and_max_age(update, monkeypatch):
+    """Pass tabs and max_age through to load_sheet."""
+    calls = []
+    monkeypatch.setattr(cm_gsheet_ata.SheetData, 'load_sheet', lambda self, **kwargs: calls.append(kwargs))
+    assert update.load_gsheet(split=False, tabs='Antenna', max_age=60)
+    assert calls[0]['tabs'] == 'Antenna'
+    assert calls[0]['max_age'] == 60
+    assert update.gsheet is not None
+
+
+def test_load_gsheet_failed_tab(update, monkeypatch, capsys):
+    """Report a failed tab and leave nothing to update from."""
+    def load_sheet(self, **kwargs):
+        raise OSError("Could not read the googlesheet tab(s) Tuning.")
+    monkeypatch.setattr(cm_gsheet_ata.SheetData, 'load_sheet', load_sheet)
+    assert not update.load_gsheet()
+    assert update.gsheet is None
+    assert 'Tuning' in capsys.readouterr().out
+    update.finish()
+    assert update.update_counter == 0
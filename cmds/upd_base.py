@@ -126,13 +126,30 @@ class Update():
         """Set class date variable."""
         self.at_date = cm_utils.get_astropytime(adate=cdate, atime=ctime)
 
-    def load_gsheet(self, split=True, arc_csv='none', tabs=None, path='', time_tag='_%y%m%d'):
-        """Get the googlesheet information from the internet."""
+    def load_gsheet(self, split=True, arc_csv='none', tabs=None, path='', time_tag='_%y%m%d', max_age=0):
+        """
+        Get the googlesheet information from the internet.
+
+        See cm_gsheet_ata.SheetData.load_sheet for arc_csv, tabs, path, time_tag and max_age.
+
+        Returns
+        -------
+        bool
+            False if the googlesheet could not be read, in which case self.gsheet is None
+            and there is nothing to update from.
+        """
         self.gsheet = cm_gsheet_ata.SheetData()
-        self.gsheet.load_sheet(arc_csv=arc_csv, tabs=None, path=path, time_tag=time_tag)
+        try:
+            self.gsheet.load_sheet(arc_csv=arc_csv, tabs=tabs, path=path, time_tag=time_tag,
+                                   max_age=max_age)
+        except OSError as e:
+            print(f"Googlesheet not read, so no updates:  {e}")
+            self.gsheet = None
+            return False
         if split:
             self.gsheet.split_apriori()
             self.gsheet.split_comments()
+        return True
 
     def alert_email(self, subj, msg, to_addr, from_addr=''):
         from cmds import watch_dog
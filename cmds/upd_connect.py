@@ -33,7 +33,9 @@ class UpdateConnect(upd_base.Update):
         self.load_active(['parts', 'connections'])
 
     def update_workflow(self, node_csv='n'):
-        self.load_gsheet(node_csv)
+        if not self.load_gsheet(node_csv):
+            self.finish()
+            return
         self.make_sheet_connections()
         self.compare_connections()
         self.add_missing_parts()
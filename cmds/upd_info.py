@@ -29,7 +29,8 @@ class UpdateInfo(upd_base.Update):
     
     def update_workflow(self):
         """See cmds_auto_update_info.py"""
-        self.load_gsheet()
+        if not self.load_gsheet():
+            return
         self.gsheet.split_apriori()
         self.add_apriori()
         self.gsheet.split_comments()
@@ -47,11 +47,11 @@ if args.archive_path.startswith('___'):
 if args.archive_gsheet.startswith('___'):
     args.archive_gsheet = path.join(update.script_path, args.archive_gsheet[3:])
 
-update.load_gsheet(split=False, arc_csv=args.arc_csv, path=args.archive_gsheet, time_tag=args.time_tag)
-update.make_sheet_connections()
-update.compare_connections(args.direction)
-update.add_missing_parts()
-update.add_missing_connections()
-update.add_partial_connections()
-update.add_different_connections()
+if update.load_gsheet(split=False, arc_csv=args.arc_csv, path=args.archive_gsheet, time_tag=args.time_tag):
+    update.make_sheet_connections()
+    update.compare_connections(args.direction)
+    update.add_missing_parts()
+    update.add_missing_connections()
+    update.add_partial_connections()
+    update.add_different_connections()
 update.finish(cronjob_script=cronjob_script, archive_to=args.archive_path, alert=args.alert)
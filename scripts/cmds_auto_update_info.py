@@ -47,9 +47,8 @@ if args.archive_path.startswith('___'):
 if args.archive_gsheet.startswith('___'):
     args.archive_gsheet = path.join(update.script_path, args.archive_gsheet[3:])
 
-update.load_gsheet(split=True, arc_csv=args.arc_csv, path=args.archive_gsheet, time_tag=args.time_tag)
-
-update.add_comments(duplication_window=args.duplication_window, view_duplicate=args.view_duplicate)
-update.add_apriori(comment='auto-update')
+if update.load_gsheet(split=True, arc_csv=args.arc_csv, path=args.archive_gsheet, time_tag=args.time_tag):
+    update.add_comments(duplication_window=args.duplication_window, view_duplicate=args.view_duplicate)
+    update.add_apriori(comment='auto-update')
 
 update.finish(cronjob_script=cronjob_script, archive_to=args.archive_path, alert=args.alert)
@@ -143,9 +143,10 @@ with cm.CMSessionWrapper() as session:
         dossier = cm_dossier.Dossier(
             pn=args.pn,
             exact_match=args.exact_match,
-            at_date=date_query,            
+            active=cm_dossier.get_active_modules(columns),
+            at_date=date_query,
             session=session
         )
-        dossier.load_dossier()
-        print(dossier.show_dossier(columns))
+        dossier.load_dossier(load_info=cm_dossier.uses_info(columns))
+        print(dossier.show_dossier(columns, ports=args.ports))
     print()
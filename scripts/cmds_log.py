@@ -92,5 +92,5 @@ with cm.CMSessionWrapper() as session:
             session=session
         )
         dossier.load_dossier(window=args.window)
-        print(dossier.show_dossier(columns))
+        print(dossier.show_dossier(columns, ports=args.ports))
     print()
\ No newline at end of file